@@ -0,0 +1,97 @@
+# Scanno_auth/app/backends.py
+import json
+import logging
+from typing import List
+from fastapi import HTTPException
+
+from app.config import ANALYSIS_ROUTING, LOCAL_MIN_CONFIDENCE
+from app import local_analyzer
+
+class BackendUnavailable(Exception):
+    """The backend cannot serve this call (no API key, unsupported input, low confidence)."""
+
+    def __init__(self, detail: str, skipped: bool = False):
+        super().__init__(detail)
+        # The tier passed by design (input it never handles, below its cheap-first threshold),
+        # so its reason is not worth showing the user.
+        self.skipped = skipped
+
+
+class AnalysisBackend:
+    """
+    One tier of report analysis. Every method returns the raw model-style string
+    (JSON for analyses, plain text for chat) or raises BackendUnavailable.
+    """
+    name = "base"
+
+    def analyze_text(self, text: str, engineer_email: str = None) -> str:
+        raise BackendUnavailable(f"{self.name} cannot analyze text.", skipped=True)
+
+    def analyze_image(self, image_bytes: bytes, engineer_email: str = None) -> str:
+        raise BackendUnavailable(f"{self.name} cannot analyze images.", skipped=True)
+
+    def analyze_images(self, images: List[bytes], engineer_email: str = None) -> str:
+        raise BackendUnavailable(f"{self.name} cannot analyze images.", skipped=True)
+
+    def chat(self, messages: List[dict], engineer_email: str = None) -> str:
+        raise BackendUnavailable(f"{self.name} cannot chat.", skipped=True)
+
+
+class RuleBasedBackend(AnalysisBackend):
+    """CPU-only keyword extractor for text reports; needs no network or API key."""
+    name = "local-rules"
+
+    def __init__(self, min_confidence: float = 0.0):
+        self.min_confidence = min_confidence
+
+    def analyze_text(self, text: str, engineer_email: str = None) -> str:
+        report = local_analyzer.analyze_text(text)
+        confidence = report.pop("confidence")
+        if confidence < self.min_confidence:
+            raise BackendUnavailable(f"Local analysis confidence {confidence} below {self.min_confidence}.", skipped=True)
+        if report["risk_level"] == "Low" and not confidence:
+            # "Car looks fine" with nothing in the report backing it is worse than no answer.
+            raise BackendUnavailable("Local analysis found no evidence for a verdict.")
+        report["source"] = self.name
+        return json.dumps(report, ensure_ascii=False)
+
+    def chat(self, messages: List[dict], engineer_email: str = None) -> str:
+        # Template answers are a last resort, never a cheap-first choice.
+        if self.min_confidence > 0:
+            raise BackendUnavailable("Local chat is only used as a fallback.", skipped=True)
+        return local_analyzer.answer_followup(messages)
+
+
+def build_backend_chain(primary: AnalysisBackend, routing: str = ANALYSIS_ROUTING) -> List[AnalysisBackend]:
+    """
+    openai      - primary only (previous behaviour).
+    fallback    - primary, then the local tier if it is missing or failing.
+    cheap-first - confident local results first, then primary, then local at any confidence.
+    """
+    if routing == "openai":
+        return [primary]
+    if routing == "cheap-first":
+        return [RuleBasedBackend(LOCAL_MIN_CONFIDENCE), primary, RuleBasedBackend()]
+    return [primary, RuleBasedBackend()]
+
+def run_backends(backends: List[AnalysisBackend], method: str, *args, **kwargs) -> str:
+    unavailable, failure = [], None
+    for backend in backends:
+        try:
+            result = getattr(backend, method)(*args, **kwargs)
+        except BackendUnavailable as e:
+            unavailable.append(e)
+            continue
+        except Exception as e:
+            logging.warning(f"{backend.name} {method} failed: {type(e).__name__} - {e}")
+            failure = failure or e
+            continue
+        if backend is not backends[0]:
+            logging.info(f"{method} served by fallback backend {backend.name}.")
+        return result
+
+    if failure is not None:
+        raise failure
+    # Surface the first meaningful reason (e.g. the missing API key), not "cannot analyze images" from the local tier.
+    reasons = [e for e in unavailable if not e.skipped] or unavailable
+    raise HTTPException(status_code=503, detail=str(reasons[0]) if reasons else "No analysis backend available.")
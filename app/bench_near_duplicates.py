@@ -0,0 +1,122 @@
+# app/bench_near_duplicates.py
+# Precision/recall and lookup-latency benchmark for near-duplicate detection.
+# Run with: python -m app.bench_near_duplicates [reports]
+import io
+import sys
+import time
+import random
+from PIL import Image, ImageDraw, ImageEnhance, ImageFilter
+
+from app.config import DUPLICATE_PHASH_THRESHOLD, DUPLICATE_DHASH_THRESHOLD, DUPLICATE_INDEX_SIZE
+from app.near_duplicates import compute_hashes, is_near_duplicate, hamming
+
+PAGE_SIZE = (850, 1100)
+
+def make_report(rng: random.Random, template_seed: int) -> Image.Image:
+    # Reports sharing a template_seed share the form layout and differ only in the filled-in values.
+    layout = random.Random(template_seed)
+    page = Image.new("RGB", PAGE_SIZE, "white")
+    draw = ImageDraw.Draw(page)
+    draw.rectangle((40, 40, 810, 140), outline="black", width=3)
+    draw.text((60, 70), f"VEHICLE INSPECTION REPORT #{layout.randint(1, 9)}", fill="black")
+
+    y = 170
+    while y < 1040:
+        height = layout.randint(30, 70)
+        draw.rectangle((40, y, 810, y + height), outline="black")
+        draw.text((50, y + 8), f"Item {layout.randint(100, 999)}", fill="black")
+        status = rng.choice(["OK", "FAIL", "WORN", "N/A", "REPLACE"])
+        draw.text((500, y + 8), f"{status} {rng.randint(0, 99999)}", fill="black")
+        if rng.random() < 0.3:
+            draw.ellipse((700, y + 4, 700 + height - 8, y + height - 4), outline="red", width=3)
+        y += height + 6
+    return page
+
+def retake(image: Image.Image, rng: random.Random) -> bytes:
+    """Simulate photographing the same paper again."""
+    angle = rng.uniform(-1.5, 1.5)
+    image = image.rotate(angle, expand=False, fillcolor="white")
+    width, height = image.size
+    margin = int(min(width, height) * rng.uniform(0.0, 0.03))
+    image = image.crop((margin, margin, width - margin, height - margin))
+    scale = rng.uniform(0.6, 1.2)
+    image = image.resize((int(image.width * scale), int(image.height * scale)))
+    image = ImageEnhance.Brightness(image).enhance(rng.uniform(0.8, 1.15))
+    image = ImageEnhance.Contrast(image).enhance(rng.uniform(0.85, 1.15))
+    if rng.random() < 0.5:
+        image = image.filter(ImageFilter.GaussianBlur(rng.uniform(0.3, 1.2)))
+    return to_jpeg(image, rng.randint(55, 90))
+
+def to_jpeg(image: Image.Image, quality: int = 85) -> bytes:
+    buffer = io.BytesIO()
+    image.convert("RGB").save(buffer, "JPEG", quality=quality)
+    return buffer.getvalue()
+
+def evaluate(distances, phash_threshold: int, dhash_threshold: int):
+    true_pos = false_pos = false_neg = 0
+    for report_id, probe_distances in distances:
+        matches = {
+            i for i, (p, d) in enumerate(probe_distances)
+            if p <= phash_threshold and d <= dhash_threshold
+        }
+        if report_id in matches:
+            true_pos += 1
+        else:
+            false_neg += 1
+        false_pos += len(matches - {report_id})
+
+    precision = true_pos / (true_pos + false_pos) if true_pos + false_pos else 1.0
+    recall = true_pos / (true_pos + false_neg) if true_pos + false_neg else 1.0
+    return precision, recall
+
+def run_scenario(name: str, reports: int, templates: int, retakes: int, rng: random.Random):
+    originals = [make_report(rng, i % templates) for i in range(reports)]
+    indexed = [compute_hashes(to_jpeg(image)) for image in originals]
+
+    distances = []
+    for report_id, image in enumerate(originals):
+        for _ in range(retakes):
+            probe = compute_hashes(retake(image, rng))
+            distances.append((
+                report_id,
+                [(hamming(probe[0], c[0]), hamming(probe[1], c[1])) for c in indexed],
+            ))
+
+    print(f"\n{name}: {reports * retakes} retakes of {reports} reports, {templates} distinct layouts")
+    print("  pHash  dHash  precision  recall")
+    sweep = sorted({
+        (DUPLICATE_PHASH_THRESHOLD, DUPLICATE_DHASH_THRESHOLD),
+        (4, 6), (5, 7), (6, 8), (8, 12), (10, 14), (12, 16),
+    })
+    for phash_threshold, dhash_threshold in sweep:
+        precision, recall = evaluate(distances, phash_threshold, dhash_threshold)
+        marker = "  <- configured" if (phash_threshold, dhash_threshold) == (DUPLICATE_PHASH_THRESHOLD, DUPLICATE_DHASH_THRESHOLD) else ""
+        print(f"  {phash_threshold:>5}  {dhash_threshold:>5}  {precision:>9.3f}  {recall:>6.3f}{marker}")
+
+def main(reports: int = 40, retakes: int = 3):
+    rng = random.Random(42)
+
+    sample = to_jpeg(make_report(rng, 0))
+    start = time.perf_counter()
+    for _ in range(20):
+        probe = compute_hashes(sample)
+    hash_ms = (time.perf_counter() - start) * 1000 / 20
+
+    # Lookup cost once Redis has returned the engineer's recent-upload index.
+    candidates = [(rng.getrandbits(64), rng.getrandbits(64)) for _ in range(DUPLICATE_INDEX_SIZE)]
+    rounds = 200
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for candidate in candidates:
+            is_near_duplicate(probe, candidate)
+    lookup_ms = (time.perf_counter() - start) * 1000 / rounds
+
+    print(f"hash time        {hash_ms:.2f} ms/image")
+    print(f"lookup time      {lookup_ms:.3f} ms over {len(candidates)} indexed uploads")
+
+    run_scenario("Distinct reports", reports, reports, retakes, rng)
+    # Same checklist form, different car: the case where a false match would reuse the wrong analysis.
+    run_scenario("Shared templates", reports, 5, retakes, rng)
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 40)
@@ -0,0 +1,100 @@
+# app/bench_rollups.py
+# Compares admin analytics served from rollups against ad-hoc scans of the history table.
+# Run with: python -m app.bench_rollups [rows]   (uses a throwaway SQLite database)
+import os
+import sys
+import time
+import random
+import tempfile
+from datetime import date, datetime, timedelta
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.schemas import HistoryCreate
+from app.rollups import RISK_LEVELS, rebuild_rollups, get_daily_analytics, get_engineer_analytics
+
+DAYS = 365
+ENGINEERS = 200
+
+def timed(label: str, func, repeat: int = 1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    elapsed_ms = (time.perf_counter() - start) * 1000 / repeat
+    print(f"  {label:<46} {elapsed_ms:10.2f} ms")
+    return result
+
+def seed(engine, rows: int):
+    rng = random.Random(7)
+    start_day = datetime.combine(date.today() - timedelta(days=DAYS - 1), datetime.min.time())
+    table = models.History.__table__
+    batch = []
+    with engine.begin() as connection:
+        for i in range(rows):
+            batch.append({
+                "engineer_email": f"engineer{rng.randrange(ENGINEERS)}@scanno.ai",
+                "chat_data": '{"file": "report.jpg", "report_summary": "ok"}',
+                "risk_level": rng.choice(RISK_LEVELS),
+                "latency_ms": rng.randint(2000, 12000),
+                "timestamp": start_day + timedelta(seconds=rng.randrange(DAYS * 86400)),
+            })
+            if len(batch) == 50_000:
+                connection.execute(table.insert(), batch)
+                batch.clear()
+        if batch:
+            connection.execute(table.insert(), batch)
+
+def scan_daily(db, since: date):
+    day = func.date(models.History.timestamp)
+    return (
+        db.query(day, models.History.risk_level, func.count(models.History.id), func.avg(models.History.latency_ms))
+        .filter(models.History.timestamp >= datetime.combine(since, datetime.min.time()))
+        .group_by(day, models.History.risk_level)
+        .all()
+    )
+
+def scan_engineers(db, since: date):
+    return (
+        db.query(models.History.engineer_email, models.History.risk_level, func.count(models.History.id), func.avg(models.History.latency_ms))
+        .filter(models.History.timestamp >= datetime.combine(since, datetime.min.time()))
+        .group_by(models.History.engineer_email, models.History.risk_level)
+        .all()
+    )
+
+def main(rows: int = 1_000_000):
+    path = os.path.join(tempfile.mkdtemp(), "bench_rollups.db")
+    engine = create_engine(f"sqlite:///{path}")
+    models.Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    print(f"Seeding {rows:,} history rows over {DAYS} days and {ENGINEERS} engineers...")
+    timed("seed", lambda: seed(engine, rows))
+    timed("full rollup rebuild (backfill)", lambda: rebuild_rollups(db, date(1970, 1, 1)))
+    rollup_rows = db.query(models.ReportRollupDaily).count()
+    print(f"  {rollup_rows:,} rollup rows")
+
+    for days in (7, 30, 365):
+        since = date.today() - timedelta(days=days - 1)
+        print(f"\nLast {days} days")
+        timed("daily: history scan", lambda: scan_daily(db, since), repeat=3)
+        timed("daily: rollups", lambda: get_daily_analytics(db, since), repeat=3)
+        timed("per engineer: history scan", lambda: scan_engineers(db, since), repeat=3)
+        timed("per engineer: rollups", lambda: get_engineer_analytics(db, since), repeat=3)
+
+    # Write-path cost of keeping rollups current on every report.
+    from app import crud
+    history = HistoryCreate(chat_data='{"file": "report.jpg", "report_summary": "ok"}')
+    print("\nWrite path")
+    timed(
+        "create_history_entry + rollup upserts",
+        lambda: crud.create_history_entry(db, history, "engineer1@scanno.ai", risk_level="High", latency_ms=5000),
+        repeat=200,
+    )
+
+    db.close()
+    engine.dispose()
+    os.remove(path)
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,57 @@
+# app/check_import_time.py
+# Startup regression check, suitable for CI: python -m app.check_import_time [budget_ms]
+# Fails if importing app.main exceeds the budget or pulls in a dependency that must stay lazy.
+import os
+import re
+import sys
+import subprocess
+
+DEFAULT_BUDGET_MS = int(os.getenv("IMPORT_TIME_BUDGET_MS", 1500))
+
+# Loaded on first use by the request that needs them, never at startup.
+LAZY_MODULES = ("openai", "pdfplumber", "pdfminer", "PIL", "tenacity")
+
+LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+def measure(module: str = "app.main"):
+    env = dict(os.environ, LOG_FILE="")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    imports = {}
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            imports[name] = (int(self_us), int(cumulative_us), len(indent) // 2)
+    return imports
+
+def main(budget_ms: int = DEFAULT_BUDGET_MS) -> int:
+    imports = measure()
+    total_ms = imports["app.main"][1] / 1000
+    eager = sorted(name for name in imports if name.split(".")[0] in LAZY_MODULES)
+
+    direct = sorted(
+        ((name, cumulative) for name, (_, cumulative, depth) in imports.items() if depth == 1),
+        key=lambda item: item[1],
+        reverse=True,
+    )
+    print(f"app.main imported in {total_ms:.0f} ms (budget {budget_ms} ms)")
+    for name, cumulative in direct[:10]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    failed = False
+    if total_ms > budget_ms:
+        print(f"FAIL: startup import time {total_ms:.0f} ms exceeds budget {budget_ms} ms")
+        failed = True
+    if eager:
+        print(f"FAIL: lazy dependencies imported at startup: {', '.join(eager[:10])}")
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_BUDGET_MS))
@@ -17,4 +17,54 @@ ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "supersecretadminpass")
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 REDIS_DB = int(os.getenv("REDIS_DB", 0))
-SESSION_TTL = 3600 # Session expiration time in seconds (1 hour)
\ No newline at end of file
+REDIS_PASSWORD = os.getenv("REDIS_PASSWORD") or None
+REDIS_MODE = os.getenv("REDIS_MODE", "standalone") # standalone | sentinel | cluster
+REDIS_SENTINELS = os.getenv("REDIS_SENTINELS", "") # "host1:26379,host2:26379"
+REDIS_SENTINEL_SERVICE = os.getenv("REDIS_SENTINEL_SERVICE", "mymaster")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", 2.0))
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", 2.0))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", 15)) # Seconds between background pings
+REDIS_BREAKER_THRESHOLD = int(os.getenv("REDIS_BREAKER_THRESHOLD", 5)) # Consecutive failures before failing fast
+REDIS_BREAKER_RESET = float(os.getenv("REDIS_BREAKER_RESET", 30)) # Seconds before a trial call is let through
+SESSION_TTL = 3600 # Session expiration time in seconds (1 hour)
+
+DAILY_TOKEN_QUOTA = int(os.getenv("DAILY_TOKEN_QUOTA", 0)) # Per engineer, 0 disables
+DAILY_REQUEST_QUOTA = int(os.getenv("DAILY_REQUEST_QUOTA", 0)) # Per engineer, 0 disables
+USAGE_FLUSH_INTERVAL = int(os.getenv("USAGE_FLUSH_INTERVAL", 60)) # Seconds between Redis -> SQL usage flushes
+
+ROLLUP_MODE = os.getenv("ROLLUP_MODE", "incremental") # incremental | compactor
+ROLLUP_COMPACT_DAYS = int(os.getenv("ROLLUP_COMPACT_DAYS", 2)) # compactor: days rebuilt per run
+ROLLUP_COMPACT_INTERVAL = int(os.getenv("ROLLUP_COMPACT_INTERVAL", 300)) # compactor: seconds between runs
+
+FLAGSHIP_MODEL = os.getenv("FLAGSHIP_MODEL", "gpt-4o") # Report analysis (text + vision) and complex chat turns
+SMALL_CHAT_MODEL = os.getenv("SMALL_CHAT_MODEL", "gpt-4o-mini") # Simple follow-up chat turns
+CHAT_MODEL_ROUTING = os.getenv("CHAT_MODEL_ROUTING", "true").lower() == "true"
+CHAT_SIMPLE_MAX_CHARS = int(os.getenv("CHAT_SIMPLE_MAX_CHARS", 120)) # Longer turns always go to the flagship
+CHAT_SIMPLE_MAX_HISTORY = int(os.getenv("CHAT_SIMPLE_MAX_HISTORY", 20)) # Longer sessions always go to the flagship
+# USD per 1M tokens (prompt, completion), used for the per-route cost estimates
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+
+ANALYSIS_ROUTING = os.getenv("ANALYSIS_ROUTING", "openai") # openai | fallback | cheap-first
+LOCAL_MIN_CONFIDENCE = float(os.getenv("LOCAL_MIN_CONFIDENCE", 0.67)) # cheap-first: local result used at or above this
+
+MAX_REPORT_IMAGES = int(os.getenv("MAX_REPORT_IMAGES", 10)) # Pages accepted by /analyze-report/multi
+VISION_MAX_SIDE = int(os.getenv("VISION_MAX_SIDE", 2048)) # Longer side pages are downscaled to before upload
+
+DUPLICATE_DETECTION = os.getenv("DUPLICATE_DETECTION", "false").lower() == "true" # Opt-in: see python -m app.bench_near_duplicates
+DUPLICATE_PHASH_THRESHOLD = int(os.getenv("DUPLICATE_PHASH_THRESHOLD", 4)) # Max differing bits out of 64
+DUPLICATE_DHASH_THRESHOLD = int(os.getenv("DUPLICATE_DHASH_THRESHOLD", 6)) # Max differing bits out of 64
+DUPLICATE_INDEX_SIZE = int(os.getenv("DUPLICATE_INDEX_SIZE", 500)) # Recent uploads kept per engineer
+DUPLICATE_TTL = int(os.getenv("DUPLICATE_TTL", 7 * 24 * 3600)) # Seconds a reusable analysis is kept
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FILE = os.getenv("LOG_FILE", "scanno_integrated.{pid}.log") # "{pid}" gives each worker its own file, empty disables the file
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", 8000))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "false").lower() == "true" # Otherwise run `python -m app.migrate`
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", 60)) # Seconds uvicorn waits for open requests on SIGTERM
@@ -1,7 +1,11 @@
 # Scanno_auth/app/crud.py
+from datetime import date
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from app import models
 from app.schemas import HistoryCreate
+from app.etags import bump_version, history_version_key
+from app.rollups import dialect_insert, record_report, forget_reports, normalize_risk_level
 
 def get_engineer_by_email(db: Session, email: str):
     return db.query(models.Engineer).filter(models.Engineer.email == email).first()
@@ -35,14 +39,21 @@ def delete_api_key(db: Session):
         return True
     return False
 
-def create_history_entry(db: Session, history: HistoryCreate, engineer_email: str):
+def create_history_entry(db: Session, history: HistoryCreate, engineer_email: str, risk_level: str = None, latency_ms: int = None):
     db_history = models.History(
         engineer_email=engineer_email,
-        chat_data=history.chat_data
+        chat_data=history.chat_data,
+        risk_level=normalize_risk_level(risk_level),
+        latency_ms=latency_ms
     )
     db.add(db_history)
+    db.flush()
+    db.refresh(db_history)
+    # Same transaction as the history row, so rollups never drift from it.
+    record_report(db, db_history.timestamp.date(), engineer_email, db_history.risk_level, latency_ms)
     db.commit()
     db.refresh(db_history)
+    bump_version(history_version_key(engineer_email))
     return db_history
 
 def get_history_by_engineer_email(db: Session, engineer_email: str):
@@ -54,10 +65,36 @@ def get_history_by_engineer_email(db: Session, engineer_email: str):
     )
 
 def delete_all_history_by_engineer(db: Session, engineer_email: str) -> int:
+    # Same transaction as the delete, so rollups keep matching the remaining rows.
+    forget_reports(db, engineer_email)
     deleted_count = (
         db.query(models.History)
         .filter(models.History.engineer_email == engineer_email)
         .delete(synchronize_session=False)
     )
     db.commit()
-    return deleted_count
\ No newline at end of file
+    if deleted_count:
+        bump_version(history_version_key(engineer_email))
+    return deleted_count
+
+def upsert_usage_daily(db: Session, day: date, engineer_email: str, counters: dict):
+    # Redis holds the running totals for the day, so the row is overwritten rather than incremented.
+    # Totals only grow: keeping the larger value per field means a worker committing an older
+    # snapshot after a newer flush can never roll the row back.
+    table = models.UsageDaily.__table__
+    values = {field: counters.get(field, 0) for field in ("requests", "prompt_tokens", "completion_tokens", "latency_ms")}
+    greatest = func.greatest if db.bind.dialect.name == "postgresql" else func.max
+    statement = dialect_insert(db)(table).values(day=day, engineer_email=engineer_email, **values)
+    db.execute(statement.on_conflict_do_update(
+        index_elements=["day", "engineer_email"],
+        set_={
+            **{field: greatest(table.c[field], statement.excluded[field]) for field in values},
+            "updated_at": func.now(),
+        },
+    ))
+
+def get_usage_since(db: Session, since: date, engineer_email: str = None):
+    query = db.query(models.UsageDaily).filter(models.UsageDaily.day >= since)
+    if engineer_email:
+        query = query.filter(models.UsageDaily.engineer_email == engineer_email)
+    return query.order_by(models.UsageDaily.day.desc(), models.UsageDaily.engineer_email).all()
\ No newline at end of file
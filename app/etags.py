@@ -0,0 +1,83 @@
+# Scanno_auth/app/etags.py
+import time
+import logging
+from typing import Dict, Optional
+from fastapi import Request
+
+from app.resources import resources
+
+HISTORY_VERSION_TTL = 30 * 24 * 3600
+
+# Keys whose bump failed in this process. Until a retry succeeds they get no ETag here,
+# and retry_pending_bumps() pushes the bump through once Redis is back so that other
+# workers stop answering 304 with the stale version.
+_pending_bumps: Dict[str, int] = {}
+
+# The {session_id} hash tag keeps a session's messages and version in one cluster slot,
+# so they can be written in a single MULTI transaction.
+def session_key(session_id: str) -> str:
+    return f"chat:session:{{{session_id}}}"
+
+def session_version_key(session_id: str) -> str:
+    return f"chat:version:{{{session_id}}}"
+
+def history_version_key(engineer_email: str) -> str:
+    return f"history:version:{engineer_email}"
+
+def queue_version_bump(pipe, key: str, ttl: int):
+    # Counters start from the current time in ms rather than 1, so a counter that expired and
+    # was recreated can never repeat a version (and ETag) a client still holds.
+    pipe.set(key, int(time.time() * 1000), nx=True)
+    pipe.incr(key)
+    pipe.expire(key, ttl)
+
+def bump_version(key: str, ttl: int = HISTORY_VERSION_TTL) -> bool:
+    if resources.redis_client is None:
+        return False
+    try:
+        resources.redis_client.execute_pipeline(lambda pipe: queue_version_bump(pipe, key, ttl))
+    except ConnectionError as e:
+        logging.warning(f"Version bump for {key} failed, will retry: {e}")
+        _pending_bumps[key] = ttl
+        return False
+    _pending_bumps.pop(key, None)
+    return True
+
+def retry_pending_bumps() -> int:
+    """Periodic task: re-apply bumps that failed while Redis was unavailable."""
+    retried = 0
+    for key, ttl in list(_pending_bumps.items()):
+        if not bump_version(key, ttl):
+            break
+        retried += 1
+    if retried:
+        logging.info(f"Applied {retried} pending version bumps.")
+    return retried
+
+def current_version(key: str, ttl: int = HISTORY_VERSION_TTL) -> Optional[int]:
+    """Read a version counter, creating it if needed. None means no ETag should be sent."""
+    if resources.redis_client is None:
+        return None
+    if key in _pending_bumps and not bump_version(key, _pending_bumps[key]):
+        return None
+    try:
+        created, version = resources.redis_client.execute_pipeline(
+            lambda pipe: pipe.set(key, int(time.time() * 1000), nx=True, ex=ttl).get(key),
+            transaction=False,
+        )
+    except ConnectionError as e:
+        logging.warning(f"Version read for {key} failed: {e}")
+        return None
+    return int(version) if version is not None else None
+
+def make_etag(version: int, variant: str = "") -> str:
+    return f'"{version}{"-" + variant if variant else ""}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in candidates
@@ -0,0 +1,219 @@
+# Scanno_auth/app/local_analyzer.py
+# CPU-only rule and keyword extractor used when the OpenAI tier is unavailable or not worth calling.
+import re
+import json
+from typing import List, Optional
+
+# keywords (English and Arabic), issue text (en, ar), maintenance text (en, ar), severity 1-3
+ISSUE_LEXICON = [
+    (("brake", "brakes", "brake pad", "فرامل", "الفرامل", "المكابح"),
+     ("Brake system defect", "خلل في نظام الفرامل"),
+     ("Inspect and service the brakes immediately", "فحص وصيانة الفرامل فوراً"), 3),
+    (("steering", "rack end", "tie rod", "التوجيه", "المقود", "الدركسون"),
+     ("Steering system defect", "خلل في نظام التوجيه"),
+     ("Have the steering system checked and aligned", "فحص نظام التوجيه وضبط الزوايا"), 3),
+    (("airbag", "seat belt", "seatbelt", "الوسائد الهوائية", "وسادة هوائية", "حزام الأمان"),
+     ("Safety restraint fault", "عطل في أنظمة السلامة"),
+     ("Repair airbag / seat belt system before driving", "إصلاح الوسائد الهوائية أو حزام الأمان قبل القيادة"), 3),
+    (("chassis", "frame", "الشاصي", "الشاسيه", "الهيكل"),
+     ("Chassis or frame damage", "ضرر في الشاصي أو الهيكل"),
+     ("Get a structural inspection at an approved body shop", "فحص هيكلي في ورشة معتمدة"), 3),
+    (("tire", "tyre", "tires", "tyres", "tread", "الإطارات", "إطار", "الكفرات"),
+     ("Tyre wear or damage", "تآكل أو تلف في الإطارات"),
+     ("Replace worn tyres and check pressure", "استبدال الإطارات المتآكلة وفحص الضغط"), 2),
+    (("suspension", "shock absorber", "shock", "bushing", "التعليق", "المساعدات", "المقصات"),
+     ("Suspension wear", "تآكل في نظام التعليق"),
+     ("Replace worn suspension parts", "استبدال قطع التعليق المستهلكة"), 2),
+    (("engine", "misfire", "المحرك", "المكينة"),
+     ("Engine fault", "عطل في المحرك"),
+     ("Run engine diagnostics", "إجراء فحص كمبيوتر للمحرك"), 2),
+    (("transmission", "gearbox", "clutch", "ناقل الحركة", "القير", "الجير", "الكلتش"),
+     ("Transmission issue", "مشكلة في ناقل الحركة"),
+     ("Have the transmission inspected", "فحص ناقل الحركة"), 2),
+    (("oil leak", "leak", "leaking", "تسريب", "تهريب"),
+     ("Fluid leak", "تسريب سوائل"),
+     ("Locate and fix the leak, top up fluids", "تحديد مصدر التسريب وإصلاحه وتعبئة السوائل"), 2),
+    (("coolant", "radiator", "overheat", "overheating", "الرديتر", "التبريد", "حرارة"),
+     ("Cooling system issue", "مشكلة في نظام التبريد"),
+     ("Service the cooling system", "صيانة نظام التبريد"), 2),
+    (("exhaust", "emission", "emissions", "العادم", "الشكمان", "الانبعاثات"),
+     ("Exhaust or emissions fault", "عطل في العادم أو الانبعاثات"),
+     ("Repair the exhaust system", "إصلاح نظام العادم"), 1),
+    (("battery", "alternator", "البطارية", "الدينمو"),
+     ("Charging system weakness", "ضعف في نظام الشحن"),
+     ("Test and replace the battery if needed", "فحص البطارية واستبدالها عند الحاجة"), 1),
+    (("headlight", "tail light", "lights", "lamp", "indicator", "الأضواء", "المصابيح", "الإشارات"),
+     ("Lighting fault", "عطل في الإضاءة"),
+     ("Replace faulty bulbs or lamps", "استبدال المصابيح التالفة"), 1),
+    (("windshield", "windscreen", "glass", "wiper", "الزجاج", "المساحات"),
+     ("Windshield or wiper defect", "عيب في الزجاج أو المساحات"),
+     ("Repair the windshield / replace wipers", "إصلاح الزجاج أو استبدال المساحات"), 1),
+    (("rust", "corrosion", "صدأ", "تآكل"),
+     ("Rust or corrosion", "صدأ أو تآكل"),
+     ("Treat rust before it spreads", "معالجة الصدأ قبل انتشاره"), 1),
+    (("accident", "collision", "repainted", "حادث", "صدمة"),
+     ("Signs of previous accident repair", "آثار إصلاح حادث سابق"),
+     ("Verify repair quality with a body inspection", "التحقق من جودة الإصلاح بفحص الهيكل"), 1),
+]
+
+DEFECT_MARKERS = (
+    "fail", "failed", "defect", "defective", "worn", "damaged", "damage", "broken", "crack",
+    "cracked", "leak", "leaking", "replace", "not ok", "weak", "low", "faulty", "fault", "poor",
+    "needs", "required",
+    "راسب", "تالف", "تلف", "مستهلك", "يحتاج", "ضعيف", "عطل", "استبدال", "مكسور", "كسر", "تسريب", "غير سليم",
+)
+# Matched as word prefixes so inflections count too: "replacement", "leaks", "needs", "excessive".
+DEFECT_STEMS = ("replac", "leak", "need", "requir", "fail", "damag", "crack", "fault", "excess", "loose", "worn", "broke")
+CRITICAL_MARKERS = ("unsafe", "dangerous", "critical", "not roadworthy", "غير صالح", "خطر", "خطير")
+PASS_MARKERS = ("pass", "passed", "no defects", "roadworthy", "ناجح", "صالح للسير", "سليم")
+# A marker preceded by one of these within NEGATION_WINDOW words of the same clause is negated,
+# e.g. "not worn", "no damage", "لا يوجد تسريب". Markers that start with one are already negative.
+NEGATIONS = ("no", "not", "non", "without", "never", "لا", "غير", "بدون", "ليس", "ليست", "لايوجد")
+NEGATION_WINDOW = 3
+CLAUSE_BREAK = re.compile(r"[,;.:،؛|]")
+
+ARABIC_CHARS = re.compile(r"[؀-ۿ]")
+
+def is_arabic(text: str) -> bool:
+    letters = [c for c in text if c.isalpha()]
+    if not letters:
+        return False
+    return sum(1 for c in letters if ARABIC_CHARS.match(c)) / len(letters) > 0.3
+
+def _pattern(keyword: str) -> str:
+    if keyword in DEFECT_STEMS:
+        return rf"\b{re.escape(keyword)}\w*"
+    return re.escape(keyword) if ARABIC_CHARS.search(keyword) else rf"\b{re.escape(keyword)}\b"
+
+def _contains(line: str, keyword: str) -> bool:
+    return re.search(_pattern(keyword), line) is not None
+
+def _negated(line: str, start: int) -> bool:
+    clause = CLAUSE_BREAK.split(line[:start])[-1]
+    return any(word in NEGATIONS for word in re.findall(r"\w+", clause)[-NEGATION_WINDOW:])
+
+def _affirms(line: str, marker: str) -> bool:
+    """True if the line states `marker` at least once without a negation in front of it."""
+    if marker.split()[0] in NEGATIONS:
+        return _contains(line, marker)
+    return any(not _negated(line, match.start()) for match in re.finditer(_pattern(marker), line))
+
+def _negates(line: str, marker: str) -> bool:
+    return _contains(line, marker) and not _affirms(line, marker)
+
+def analyze_text(text: str) -> dict:
+    """Extract a report in the same JSON shape the model returns, plus a 0-1 confidence."""
+    arabic = is_arabic(text)
+    lang = 1 if arabic else 0
+    lines = [line.strip().lower() for line in text.splitlines() if line.strip()]
+
+    issues, maintenance, severity, cleared = [], [], 0, 0
+    for keywords, issue, action, weight in ISSUE_LEXICON:
+        mentioned = [line for line in lines if any(_contains(line, k) for k in keywords)]
+        if any(any(_affirms(line, m) for m in DEFECT_MARKERS + DEFECT_STEMS) for line in mentioned):
+            issues.append(issue[lang])
+            maintenance.append(action[lang])
+            severity += weight
+        elif any(any(_negates(line, m) for m in DEFECT_MARKERS + DEFECT_STEMS) for line in mentioned):
+            cleared += 1 # e.g. "Tyres: no damage" - checked and explicitly fine
+
+    critical_hits = sum(1 for line in lines if any(_affirms(line, m) for m in CRITICAL_MARKERS))
+    pass_hits = sum(
+        1 for line in lines
+        if any(_affirms(line, m) for m in PASS_MARKERS) and not any(_affirms(line, m) for m in CRITICAL_MARKERS)
+    )
+
+    if critical_hits or severity >= 7:
+        risk_level = "Critical"
+    elif severity >= 4:
+        risk_level = "High"
+    elif severity >= 1:
+        risk_level = "Medium"
+    else:
+        risk_level = "Low"
+    # An explicit PASS verdict without critical findings caps the risk: the defects are advisories.
+    if pass_hits and not critical_hits and risk_level in ("High", "Critical"):
+        risk_level = "Medium"
+
+    # Confidence counts only the evidence that agrees with the verdict; mixed signals are left to the model.
+    if risk_level == "Low":
+        support, conflict = pass_hits + cleared, critical_hits
+    else:
+        support, conflict = len(issues) + critical_hits, pass_hits
+    confidence = min(1.0, support / 3)
+    if conflict:
+        confidence = min(confidence, 0.5)
+
+    if arabic:
+        if issues:
+            summary = f"تم رصد {len(issues)} ملاحظات في التقرير."
+        elif critical_hits:
+            summary = "يصف التقرير السيارة بأنها غير آمنة دون تحديد الأعطال."
+        else:
+            summary = "لم يتم رصد مشاكل واضحة في التقرير."
+        recommendation = {
+            "Low": "السيارة بحالة جيدة حسب التقرير، التزم بالصيانة الدورية.",
+            "Medium": "يُنصح بإصلاح الملاحظات قريباً.",
+            "High": "يُنصح بإصلاح الملاحظات قبل الاستخدام المنتظم.",
+            "Critical": "لا يُنصح بقيادة السيارة قبل إصلاح الأعطال الحرجة.",
+        }[risk_level]
+    else:
+        if issues:
+            summary = f"{len(issues)} issue(s) found in the report."
+        elif critical_hits:
+            summary = "The report marks the car as unsafe without listing the specific defects."
+        else:
+            summary = "No clear defects found in the report."
+        recommendation = {
+            "Low": "Car looks fine per the report; keep up regular servicing.",
+            "Medium": "Fix the noted items soon.",
+            "High": "Fix the noted items before regular use.",
+            "Critical": "Do not drive the car until the critical defects are repaired.",
+        }[risk_level]
+
+    return {
+        "summary": summary,
+        "risk_level": risk_level,
+        "issues": issues,
+        "maintenance": maintenance,
+        "recommendation": recommendation,
+        "confidence": round(confidence, 2) if len(lines) >= 3 else 0.0,
+    }
+
+def extract_report(messages: List[dict]) -> Optional[dict]:
+    for message in messages:
+        if message.get("role") != "assistant":
+            continue
+        content = message.get("content", "")
+        start, end = content.find("{"), content.rfind("}") + 1
+        if start == -1 or end == 0:
+            continue
+        try:
+            return json.loads(content[start:end])
+        except ValueError:
+            continue
+    return None
+
+def answer_followup(messages: List[dict]) -> str:
+    """Template answer to a chat turn, grounded only on the report already in the session."""
+    question = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+    arabic = is_arabic(question)
+    report = extract_report(messages) or {}
+    lowered = question.lower()
+
+    def join(items):
+        return "\n".join(f"- {item}" for item in items) if items else ("- لا يوجد" if arabic else "- None")
+
+    if any(k in lowered for k in ("maintenance", "fix", "repair", "صيانة", "إصلاح", "اصلاح")):
+        body = ("الصيانة المقترحة:\n" if arabic else "Suggested maintenance:\n") + join(report.get("maintenance", []))
+    elif any(k in lowered for k in ("issue", "problem", "defect", "مشاكل", "مشكلة", "عيوب")):
+        body = ("الملاحظات:\n" if arabic else "Issues found:\n") + join(report.get("issues", []))
+    elif any(k in lowered for k in ("risk", "safe", "danger", "خطر", "آمن", "امان")):
+        body = (f"مستوى الخطورة: {report.get('risk_level', '-')}" if arabic
+                else f"Risk level: {report.get('risk_level', '-')}")
+    else:
+        body = f"{report.get('summary', '')}\n{report.get('recommendation', '')}".strip()
+
+    note = ("(الخدمة تعمل حالياً بوضع محدود، الإجابات مختصرة.)" if arabic
+            else "(Scanno is in limited mode right now, so answers are brief.)")
+    return f"{body}\n\n{note}"
@@ -0,0 +1,50 @@
+# Scanno_auth/app/logging_config.py
+import os
+import queue
+import logging
+import logging.handlers
+
+from app.config import LOG_LEVEL, LOG_FILE
+
+LOG_FORMAT = "%(asctime)s - %(process)d - %(levelname)s: %(message)s"
+
+_listener: logging.handlers.QueueListener = None
+_previous_handlers: list = []
+
+def setup_logging():
+    """Route all records through a queue so request handlers never block on file/console I/O."""
+    global _listener, _previous_handlers
+
+    if _listener is not None:
+        return
+
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = [logging.StreamHandler()]
+
+    if LOG_FILE:
+        handlers.append(logging.FileHandler(LOG_FILE.format(pid=os.getpid())))
+
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+
+    root = logging.getLogger()
+    _previous_handlers = root.handlers
+    root.handlers = [logging.handlers.QueueHandler(log_queue)]
+    root.setLevel(LOG_LEVEL)
+
+    _listener.start()
+
+def shutdown_logging():
+    global _listener, _previous_handlers
+
+    if _listener is not None:
+        # Detach the queue first so later records are not left unwritten in it.
+        logging.getLogger().handlers = _previous_handlers
+        _previous_handlers = []
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
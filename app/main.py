@@ -1,25 +1,50 @@
 # Scanno_auth/app/main.py
 import logging
-import redis 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
-from app.database import engine
-from app import models 
-from app.config import REDIS_HOST, REDIS_PORT, REDIS_DB
+from app.config import REDIS_HEALTH_CHECK_INTERVAL, USAGE_FLUSH_INTERVAL, MIGRATE_ON_STARTUP, ROLLUP_MODE, ROLLUP_COMPACT_INTERVAL
+from app.logging_config import setup_logging, shutdown_logging
+from app.resources import resources
+from app.usage import flush_usage
+from app.etags import retry_pending_bumps
+from app.migrate import migrate
+from app.rollups import compact_recent
 from app.routes import user_routes, admin_routes, chat_core
-from app.routes.chat_core import set_redis_client 
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s: %(message)s",
-    handlers=[logging.FileHandler("scanno_integrated.log"), logging.StreamHandler()],
-)
+setup_logging()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if MIGRATE_ON_STARTUP:
+        try:
+            migrate()
+        except Exception as e:
+            logging.error(f"Failed to create database tables: {e}")
+    resources.connect_redis()
+    resources.run_periodically(flush_usage, USAGE_FLUSH_INTERVAL)
+    resources.run_periodically(retry_pending_bumps, REDIS_HEALTH_CHECK_INTERVAL)
+    if ROLLUP_MODE == "compactor":
+        resources.run_periodically(compact_recent, ROLLUP_COMPACT_INTERVAL)
+
+    app.state.resources = resources
+    yield
+
+    # uvicorn has already waited (up to timeout_graceful_shutdown) for open requests to finish.
+    resources.cancel_periodic_tasks()
+    try:
+        flush_usage()
+    except Exception as e:
+        logging.error(f"Final usage flush failed: {e}")
+    resources.close()
+    logging.info("Application shutdown.")
+    shutdown_logging()
 
-redis_client: redis.Redis = None
 
-app = FastAPI(title="Scanno Integrated AI Analyzer")
+app = FastAPI(title="Scanno Integrated AI Analyzer", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -33,28 +58,6 @@ app.include_router(admin_routes.router, prefix="/admin", tags=["Admin (Key Manag
 app.include_router(chat_core.router, tags=["AI Core Chat"])
 
 
-@app.on_event("startup")
-def startup_event():
-    global redis_client
-    
-    try:
-        models.Base.metadata.create_all(bind=engine)
-        logging.info("SQLAlchemy database tables created/verified.")
-    except Exception as e:
-        logging.error(f"Failed to create database tables: {e}")
-    try:
-        redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, decode_responses=True)
-        redis_client.ping()
-        set_redis_client(redis_client) 
-        logging.info("Successfully connected to Redis.")
-    except Exception as e:
-        logging.error(f"Failed to connect to Redis: {e}. AI chat state will not function.")
-
-@app.on_event("shutdown")
-def shutdown_event():
-    if redis_client:
-        logging.info("Application shutdown.")
-
 @app.get("/")
 async def root():
     return JSONResponse({"message": "Scanno Integrated AI Analyzer Backend is operational."})
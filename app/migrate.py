@@ -0,0 +1,38 @@
+# app/migrate.py
+# Creates/updates the database schema. Run once per deploy, before starting workers:
+#   python -m app.migrate
+import logging
+from sqlalchemy import inspect, text
+from app import models
+from app.database import engine
+
+def add_missing_columns():
+    """create_all only creates whole tables, so new nullable columns and indexes on existing tables are added here."""
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    
+    with engine.begin() as connection:
+        for table in models.Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                logging.info(f"Added column {table.name}.{column.name}.")
+            
+            for index in table.indexes:
+                index.create(bind=connection, checkfirst=True)
+
+def migrate():
+    models.Base.metadata.create_all(bind=engine)
+    add_missing_columns()
+    logging.info("SQLAlchemy database tables created/verified.")
+
+# Run the script
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s: %(message)s")
+    migrate()
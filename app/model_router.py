@@ -0,0 +1,77 @@
+# Scanno_auth/app/model_router.py
+# Local (no API call) classification of chat turns into a cheap and a flagship route.
+import re
+from typing import List
+
+from app.config import (
+    FLAGSHIP_MODEL, SMALL_CHAT_MODEL, CHAT_MODEL_ROUTING,
+    CHAT_SIMPLE_MAX_CHARS, CHAT_SIMPLE_MAX_HISTORY,
+)
+
+ROUTE_SIMPLE = "simple"
+ROUTE_FLAGSHIP = "flagship"
+
+ROUTE_MODELS = {
+    ROUTE_SIMPLE: SMALL_CHAT_MODEL,
+    ROUTE_FLAGSHIP: FLAGSHIP_MODEL,
+}
+
+# Arabic attaches conjunctions and prepositions to the word ("والسعر", "بكم"), so Arabic patterns
+# allow an explicit prefix and use lookarounds instead of plain substring matches ("كم" in "عليكم").
+AR_START = r"(?<!\w)"
+AR_END = r"(?!\w)"
+
+# Acknowledgements and greetings only count when they are the whole turn ("ok which defect..." is a question).
+ACKNOWLEDGEMENT = re.compile(
+    r"^\s*(?:(?:thanks|thank you|thx|ok|okay|great|cool|got it|hi|hello|hey"
+    r"|شكرا|شكراً|مرحبا|تمام|السلام عليكم)[\s!.,،]*)+$",
+    re.IGNORECASE,
+)
+
+# Turns that only reword or translate what is already in the session.
+SIMPLE_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    r"\btranslat", r"\bin (arabic|english)\b", r"\bto (arabic|english)\b",
+    r"\bwhat does .{1,40} mean\b", r"\bmeaning of\b", r"\bwhat is meant\b",
+    r"\b(shorter|simpler|summari[sz]e|summary|rephrase|repeat|again)\b",
+    AR_START + r"[وف]?ترجم\w*",
+    AR_START + r"بال(عربي|عربية|انجليزي|انجليزية|إنجليزي|إنجليزية)" + AR_END,
+    AR_START + r"(ماذا|وش|شو) يعني" + AR_END,
+    AR_START + r"(ال)?معن[ىا]\w*",
+    AR_START + r"[وف]?(لخص|اختصر)\w*",
+    AR_START + r"[وف]?أعد(ها|ه)?" + AR_END,
+)]
+
+# Turns that need judgement beyond the report: costs, comparisons, buy/drive decisions.
+COMPLEX_PATTERNS = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    r"\bwhy\b", r"\bcompar", r"\bshould i\b", r"\bcost", r"\bprice", r"\bestimate", r"\bbuy\b",
+    r"\bsafe\b", r"\bhow much\b", r"\bworth\b", r"\bdifference\b", r"\bexplain\b", r"\bdiagnos",
+    AR_START + r"[وف]?(لماذا|ليش)" + AR_END,
+    AR_START + r"[وف]?(قارن|مقارن)\w*",
+    AR_START + r"[وف]?[أا]شتري\w*",
+    AR_START + r"(و|ب|ال|وال|بال)?(تكلف|سعر|أسعار|اسعار)\w*",
+    AR_START + r"[وب]?كم" + AR_END,
+    AR_START + r"[وف]?(آمن|امن|آمنة|امنة)" + AR_END,
+    AR_START + r"(ال)?(أمان|امان)" + AR_END,
+    AR_START + r"[وف]?يستحق\w*",
+    AR_START + r"[وف]?اشرح\w*",
+)]
+
+def classify_turn(message: str, history: List[dict] = None) -> str:
+    if not CHAT_MODEL_ROUTING:
+        return ROUTE_FLAGSHIP
+
+    text = message.strip()
+    if len(text) > CHAT_SIMPLE_MAX_CHARS or text.count("?") + text.count("؟") > 1:
+        return ROUTE_FLAGSHIP
+    if history is not None and len(history) > CHAT_SIMPLE_MAX_HISTORY:
+        return ROUTE_FLAGSHIP
+    if any(pattern.search(text) for pattern in COMPLEX_PATTERNS):
+        return ROUTE_FLAGSHIP
+    if ACKNOWLEDGEMENT.match(text) or any(pattern.search(text) for pattern in SIMPLE_PATTERNS):
+        return ROUTE_SIMPLE
+    # Unrecognised turns stay on the flagship: a wrong cheap answer costs more than the tokens saved.
+    return ROUTE_FLAGSHIP
+
+def route_chat_turn(messages: List[dict]) -> str:
+    question = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+    return classify_turn(question, messages)
@@ -1,5 +1,5 @@
 # Scanno_auth/app/models.py
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Date, ForeignKey, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
@@ -41,5 +41,33 @@ class History(Base):
     id                  = Column(Integer, primary_key=True, index=True)
     engineer_email      = Column(String, ForeignKey("engineer.email"), index=True) 
     chat_data           = Column(String)
-    timestamp           = Column(DateTime, default=func.now())
-    engineer            = relationship("Engineer", back_populates="history")
\ No newline at end of file
+    risk_level          = Column(String, nullable=True)
+    latency_ms          = Column(Integer, nullable=True)
+    timestamp           = Column(DateTime, default=func.now(), index=True)
+    engineer            = relationship("Engineer", back_populates="history")
+
+class UsageDaily(Base):
+    __tablename__ = "usage_daily"
+    __table_args__ = (UniqueConstraint("day", "engineer_email", name="uq_usage_day_engineer"),)
+    
+    id                  = Column(Integer, primary_key=True, index=True)
+    day                 = Column(Date, index=True)
+    engineer_email      = Column(String, index=True)
+    requests            = Column(Integer, default=0)
+    prompt_tokens       = Column(Integer, default=0)
+    completion_tokens   = Column(Integer, default=0)
+    latency_ms          = Column(Integer, default=0)
+    updated_at          = Column(DateTime, default=func.now(), onupdate=func.now())
+
+class ReportRollupDaily(Base):
+    """Report counts per day, engineer and risk level. engineer_email "*" holds the all-engineer totals."""
+    __tablename__ = "report_rollup_daily"
+    __table_args__ = (UniqueConstraint("day", "engineer_email", "risk_level", name="uq_rollup_day_engineer_risk"),)
+    
+    id                  = Column(Integer, primary_key=True, index=True)
+    day                 = Column(Date, index=True)
+    engineer_email      = Column(String, index=True)
+    risk_level          = Column(String)
+    report_count        = Column(Integer, default=0)
+    latency_ms_total    = Column(Integer, default=0)
+    latency_samples     = Column(Integer, default=0)
\ No newline at end of file
@@ -0,0 +1,172 @@
+# Scanno_auth/app/near_duplicates.py
+import io
+import math
+import hashlib
+import time
+import logging
+from typing import TYPE_CHECKING, Optional, Tuple
+
+from app.config import (
+    DUPLICATE_PHASH_THRESHOLD, DUPLICATE_DHASH_THRESHOLD,
+    DUPLICATE_INDEX_SIZE, DUPLICATE_TTL,
+)
+from app.resources import resources
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+HASH_SIZE = 8
+PHASH_SAMPLE = 32
+
+# Cosine table for the first HASH_SIZE DCT-II coefficients over PHASH_SAMPLE points.
+_DCT = [
+    [math.cos((2 * x + 1) * u * math.pi / (2 * PHASH_SAMPLE)) for x in range(PHASH_SAMPLE)]
+    for u in range(HASH_SIZE)
+]
+
+def _grayscale(image_bytes: bytes) -> "Image.Image":
+    from PIL import Image, ImageOps # Pillow is loaded on the first image upload
+
+    image = Image.open(io.BytesIO(image_bytes))
+    image.draft("L", (PHASH_SAMPLE * 4, PHASH_SAMPLE * 4)) # Let JPEG decode at reduced size
+    return ImageOps.exif_transpose(image).convert("L")
+
+def _bits_to_int(bits) -> int:
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+def dhash(image: "Image.Image") -> int:
+    from PIL import Image
+
+    pixels = list(image.resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.LANCZOS).getdata())
+    width = HASH_SIZE + 1
+    return _bits_to_int(
+        pixels[row * width + col] > pixels[row * width + col + 1]
+        for row in range(HASH_SIZE)
+        for col in range(HASH_SIZE)
+    )
+
+def phash(image: "Image.Image") -> int:
+    from PIL import Image
+
+    pixels = list(image.resize((PHASH_SAMPLE, PHASH_SAMPLE), Image.Resampling.LANCZOS).getdata())
+    rows = [pixels[y * PHASH_SAMPLE:(y + 1) * PHASH_SAMPLE] for y in range(PHASH_SAMPLE)]
+
+    # Separable 2D DCT, keeping only the low-frequency HASH_SIZE x HASH_SIZE block.
+    row_dct = [[sum(c * p for c, p in zip(_DCT[u], row)) for u in range(HASH_SIZE)] for row in rows]
+    coeffs = [
+        sum(_DCT[v][y] * row_dct[y][u] for y in range(PHASH_SAMPLE))
+        for v in range(HASH_SIZE)
+        for u in range(HASH_SIZE)
+    ]
+
+    # The DC term only reflects overall brightness, so it is left out of the median.
+    median = sorted(coeffs[1:])[len(coeffs[1:]) // 2]
+    return _bits_to_int(c > median for c in coeffs)
+
+def compute_hashes(image_bytes: bytes) -> Optional[Tuple[int, int]]:
+    try:
+        image = _grayscale(image_bytes)
+        return phash(image), dhash(image)
+    except Exception as e:
+        logging.warning(f"Perceptual hashing failed: {e}")
+        return None
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+def is_near_duplicate(a: Tuple[int, int], b: Tuple[int, int]) -> bool:
+    return (
+        hamming(a[0], b[0]) <= DUPLICATE_PHASH_THRESHOLD
+        and hamming(a[1], b[1]) <= DUPLICATE_DHASH_THRESHOLD
+    )
+
+def _encode(hashes: Tuple[int, int]) -> str:
+    return f"{hashes[0]:016x}{hashes[1]:016x}"
+
+def _decode(member: str) -> Tuple[int, int]:
+    return int(member[:16], 16), int(member[16:], 16)
+
+def content_digest(image_bytes: bytes) -> str:
+    return hashlib.sha256(image_bytes).hexdigest()
+
+def _engineer_index_key(engineer_email: str) -> str:
+    return f"dup:index:{engineer_email}"
+
+def _report_key(engineer_email: str, member: str) -> str:
+    # Scoped per engineer like the index, so colliding hashes from another engineer never overwrite it.
+    return f"dup:report:{engineer_email}:{member}"
+
+def _exact_key(digest: str) -> str:
+    return f"dup:exact:{digest}"
+
+def find_duplicate(digest: str, hashes: Optional[Tuple[int, int]], engineer_email: str) -> Optional[str]:
+    """
+    Return a stored raw analysis for this upload: a byte-identical upload by anyone, or the
+    closest of the engineer's own recent uploads within the thresholds. Perceptual matches
+    are never taken from other engineers, since a false match would return another car's verdict.
+    """
+    if resources.redis_client is None:
+        return None
+
+    start = time.perf_counter()
+    try:
+        exact_response, engineer_members = resources.redis_client.execute_pipeline(
+            lambda pipe: pipe
+                .get(_exact_key(digest))
+                .zrevrange(_engineer_index_key(engineer_email), 0, DUPLICATE_INDEX_SIZE - 1),
+            transaction=False,
+        )
+        if exact_response:
+            logging.info("Identical upload found; reusing analysis.")
+            return exact_response
+        if hashes is None:
+            return None
+
+        best, best_distance = None, None
+        for member in engineer_members:
+            candidate = _decode(member)
+            if not is_near_duplicate(hashes, candidate):
+                continue
+            distance = hamming(hashes[0], candidate[0]) + hamming(hashes[1], candidate[1])
+            if best_distance is None or distance < best_distance:
+                best, best_distance = member, distance
+                if distance == 0:
+                    break
+
+        if best is None:
+            return None
+
+        raw_response = resources.redis_client.get(_report_key(engineer_email, best))
+    except ConnectionError as e:
+        logging.warning(f"Near-duplicate lookup skipped: {e}")
+        return None
+
+    if raw_response:
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        logging.info(f"Near-duplicate upload matched (distance {best_distance}) in {elapsed_ms:.1f}ms; reusing analysis.")
+    return raw_response
+
+def index_analysis(digest: str, hashes: Optional[Tuple[int, int]], engineer_email: str, raw_response: str):
+    if resources.redis_client is None:
+        return
+
+    now = time.time()
+
+    def build(pipe):
+        pipe.set(_exact_key(digest), raw_response, ex=DUPLICATE_TTL)
+        if hashes is None:
+            return
+        member = _encode(hashes)
+        key = _engineer_index_key(engineer_email)
+        pipe.set(_report_key(engineer_email, member), raw_response, ex=DUPLICATE_TTL)
+        pipe.zadd(key, {member: now})
+        pipe.zremrangebyrank(key, 0, -(DUPLICATE_INDEX_SIZE + 1))
+        pipe.expire(key, DUPLICATE_TTL)
+
+    try:
+        resources.redis_client.execute_pipeline(build, transaction=False)
+    except ConnectionError as e:
+        logging.warning(f"Near-duplicate index not updated: {e}")
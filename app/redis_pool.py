@@ -0,0 +1,192 @@
+# Scanno_auth/app/redis_pool.py
+import time
+import logging
+import threading
+import redis
+from redis.retry import Retry
+from redis.backoff import ExponentialBackoff
+
+from app.config import (
+    REDIS_HOST, REDIS_PORT, REDIS_DB, REDIS_PASSWORD, REDIS_MODE,
+    REDIS_SENTINELS, REDIS_SENTINEL_SERVICE, REDIS_MAX_CONNECTIONS,
+    REDIS_SOCKET_TIMEOUT, REDIS_CONNECT_TIMEOUT, REDIS_HEALTH_CHECK_INTERVAL,
+    REDIS_BREAKER_THRESHOLD, REDIS_BREAKER_RESET,
+)
+
+# Only connectivity counts against the breaker. Other cluster exceptions (cross-slot
+# commands, slot-mapping errors) are client-side usage errors and are re-raised as is.
+REDIS_ERRORS = (redis.ConnectionError, redis.TimeoutError, redis.exceptions.ClusterDownError)
+
+class CircuitOpenError(ConnectionError):
+    pass
+
+
+class CircuitBreaker:
+    """Closed -> open after `threshold` consecutive failures; one trial call is allowed after `reset_timeout`."""
+
+    def __init__(self, threshold: int = REDIS_BREAKER_THRESHOLD, reset_timeout: float = REDIS_BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_progress = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_in_progress:
+                self._trial_in_progress = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                logging.info("Redis circuit closed; connection recovered.")
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_progress = False
+
+    def release_trial(self):
+        """The call failed before reaching Redis, so it says nothing about the connection."""
+        with self._lock:
+            self._trial_in_progress = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_progress = False
+            if self.opened_at is not None or self.failures >= self.threshold:
+                if self.opened_at is None:
+                    logging.error(f"Redis circuit opened after {self.failures} consecutive failures.")
+                self.opened_at = time.monotonic()
+
+
+def _build_client():
+    options = dict(
+        password=REDIS_PASSWORD,
+        decode_responses=True,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+        retry=Retry(ExponentialBackoff(cap=1, base=0.05), retries=2),
+        retry_on_timeout=True,
+    )
+
+    if REDIS_MODE == "cluster":
+        from redis.cluster import RedisCluster
+        return RedisCluster(host=REDIS_HOST, port=REDIS_PORT, max_connections=REDIS_MAX_CONNECTIONS, **options)
+
+    options["health_check_interval"] = REDIS_HEALTH_CHECK_INTERVAL
+
+    if REDIS_MODE == "sentinel":
+        from redis.sentinel import Sentinel
+        sentinels = [
+            (host, int(port))
+            for host, port in (node.strip().rsplit(":", 1) for node in REDIS_SENTINELS.split(",") if node.strip())
+        ]
+        sentinel = Sentinel(
+            sentinels,
+            socket_timeout=REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+        )
+        return sentinel.master_for(REDIS_SENTINEL_SERVICE, db=REDIS_DB, max_connections=REDIS_MAX_CONNECTIONS, **options)
+
+    pool = redis.ConnectionPool(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, max_connections=REDIS_MAX_CONNECTIONS, **options)
+    return redis.Redis(connection_pool=pool)
+
+
+class ManagedRedis:
+    """
+    Redis client wrapper that routes every command through a circuit breaker.
+
+    Commands are proxied to the underlying client, e.g. `managed.lrange(key, 0, -1)`.
+    Connection failures and an open circuit are raised as the builtin ConnectionError,
+    which the routes already map to 503.
+    """
+
+    def __init__(self, breaker: CircuitBreaker = None):
+        self.breaker = breaker or CircuitBreaker()
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return self.breaker.state != "open"
+
+    def _get_client(self):
+        # Built lazily so a Redis outage at boot does not require a restart to recover.
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = _build_client()
+        return self._client
+
+    def call(self, func_name: str, *args, **kwargs):
+        if not self.breaker.allow():
+            raise CircuitOpenError("Redis circuit is open; failing fast.")
+        try:
+            result = getattr(self._get_client(), func_name)(*args, **kwargs)
+        except REDIS_ERRORS as e:
+            self.breaker.record_failure()
+            raise ConnectionError(f"Redis command '{func_name}' failed: {e}") from e
+        except redis.RedisError:
+            # Redis answered (e.g. a WRONGTYPE reply), so the connection itself is healthy.
+            self.breaker.record_success()
+            raise
+        except redis.exceptions.RedisClusterException:
+            self.breaker.release_trial()
+            raise
+        self.breaker.record_success()
+        return result
+
+    def execute_pipeline(self, build, transaction: bool = True):
+        """Run `build(pipe)` on a fresh pipeline and execute it as one guarded round trip."""
+        if not self.breaker.allow():
+            raise CircuitOpenError("Redis circuit is open; failing fast.")
+        try:
+            pipe = self._get_client().pipeline(transaction=transaction)
+            build(pipe)
+            result = pipe.execute()
+        except REDIS_ERRORS as e:
+            self.breaker.record_failure()
+            raise ConnectionError(f"Redis pipeline failed: {e}") from e
+        except redis.RedisError:
+            # Redis answered (e.g. a WRONGTYPE reply), so the connection itself is healthy.
+            self.breaker.record_success()
+            raise
+        except redis.exceptions.RedisClusterException:
+            self.breaker.release_trial()
+            raise
+        self.breaker.record_success()
+        return result
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self.call(name, *args, **kwargs)
+
+    def health_check(self) -> bool:
+        try:
+            self.call("ping")
+            return True
+        except ConnectionError as e:
+            logging.warning(f"Redis health check failed: {e}")
+            return False
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+            if REDIS_MODE != "cluster":
+                self._client.connection_pool.disconnect()
+            self._client = None
@@ -0,0 +1,75 @@
+# Scanno_auth/app/resources.py
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Callable, Dict, List
+
+from app.config import REDIS_HEALTH_CHECK_INTERVAL
+from app.database import engine
+from app.redis_pool import ManagedRedis
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+class Resources:
+    """Per-process container for pooled clients, opened and closed by the app lifespan."""
+
+    def __init__(self):
+        self.engine = engine
+        self.redis_client: ManagedRedis = None
+        self._openai_clients: Dict[str, "OpenAI"] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    def connect_redis(self) -> ManagedRedis:
+        # Never raises: if Redis is down the breaker opens and the health check reconnects later.
+        self.redis_client = ManagedRedis()
+        if self.redis_client.health_check():
+            logging.info("Successfully connected to Redis.")
+        else:
+            logging.error("Redis is unreachable. AI chat state will be unavailable until it recovers.")
+        self.run_periodically(self.redis_client.health_check, REDIS_HEALTH_CHECK_INTERVAL)
+        return self.redis_client
+
+    def run_periodically(self, func: Callable, interval: float):
+        """Run a blocking `func` in a worker thread every `interval` seconds until shutdown."""
+        async def loop():
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await asyncio.to_thread(func)
+                except Exception as e:
+                    logging.error(f"Periodic task {func.__name__} failed: {e}")
+
+        self._tasks.append(asyncio.get_running_loop().create_task(loop()))
+
+    def cancel_periodic_tasks(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+
+    def get_openai_client(self, api_key: str) -> "OpenAI":
+        # One client (and HTTP connection pool) per key, reused across requests.
+        client = self._openai_clients.get(api_key)
+        if client is None:
+            from openai import OpenAI # Imported on first use: the SDK dominates cold start.
+            client = OpenAI(api_key=api_key)
+            self._openai_clients[api_key] = client
+        return client
+
+    def close_openai_clients(self):
+        for client in self._openai_clients.values():
+            client.close()
+        self._openai_clients.clear()
+
+    def close(self):
+        self.cancel_periodic_tasks()
+        self.close_openai_clients()
+
+        if self.redis_client is not None:
+            self.redis_client.close()
+            self.redis_client = None
+
+        self.engine.dispose()
+        logging.info("Closed Redis pool, database engine and OpenAI clients.")
+
+
+resources = Resources()
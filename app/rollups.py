@@ -0,0 +1,219 @@
+# Scanno_auth/app/rollups.py
+# Incrementally maintained report rollups backing the admin analytics endpoints.
+# Backfill/repair: python -m app.rollups [since YYYY-MM-DD]
+import os
+import sys
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import func, literal_column
+from sqlalchemy.orm import Session
+
+from app import models
+from app.config import ROLLUP_MODE, ROLLUP_COMPACT_DAYS, ROLLUP_COMPACT_INTERVAL
+from app.resources import resources
+
+RISK_LEVELS = ("Low", "Medium", "High", "Critical")
+UNKNOWN_RISK = "Unknown"
+COMPACTOR_LOCK_KEY = "rollups:compactor:lock"
+ALL_ENGINEERS = "*"
+
+def normalize_risk_level(risk_level: Optional[str]) -> str:
+    if not risk_level:
+        return UNKNOWN_RISK
+    risk_level = str(risk_level).strip().capitalize()
+    return risk_level if risk_level in RISK_LEVELS else UNKNOWN_RISK
+
+def dialect_insert(db: Session):
+    """The dialect's INSERT construct, which supports on_conflict_do_update."""
+    if db.bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+def record_report(db: Session, day: date, engineer_email: str, risk_level: str, latency_ms: Optional[int]):
+    """Add one report to the rollups inside the caller's transaction (atomic upserts, safe across workers)."""
+    if ROLLUP_MODE != "incremental":
+        return
+
+    insert = dialect_insert(db)
+    table = models.ReportRollupDaily.__table__
+    latency_total = latency_ms or 0
+    latency_samples = 1 if latency_ms is not None else 0
+
+    for email in (engineer_email, ALL_ENGINEERS):
+        statement = insert(table).values(
+            day=day,
+            engineer_email=email,
+            risk_level=risk_level,
+            report_count=1,
+            latency_ms_total=latency_total,
+            latency_samples=latency_samples,
+        )
+        db.execute(statement.on_conflict_do_update(
+            index_elements=["day", "engineer_email", "risk_level"],
+            set_={
+                "report_count": table.c.report_count + 1,
+                "latency_ms_total": table.c.latency_ms_total + latency_total,
+                "latency_samples": table.c.latency_samples + latency_samples,
+            },
+        ))
+
+def _history_groups(db: Session, *filters):
+    """(day, engineer_email, risk_level, count, latency total, latency samples) summed over history rows."""
+    day = func.date(models.History.timestamp)
+    # Group by the expression itself: a bare "risk_level" would resolve to the raw column on
+    # Postgres and split NULL and "Unknown" rows into two groups with the same key.
+    # The default is inlined so the SELECT and GROUP BY expressions render identically (no bind params).
+    risk_level = func.coalesce(models.History.risk_level, literal_column(f"'{UNKNOWN_RISK}'"))
+    grouped = (
+        db.query(
+            day,
+            models.History.engineer_email,
+            risk_level,
+            func.count(models.History.id),
+            func.coalesce(func.sum(models.History.latency_ms), 0),
+            func.count(models.History.latency_ms),
+        )
+        .filter(*filters)
+        .group_by(day, models.History.engineer_email, risk_level)
+        .all()
+    )
+    return [
+        (row_day if isinstance(row_day, date) else date.fromisoformat(str(row_day)), *values)
+        for row_day, *values in grouped
+    ]
+
+def forget_reports(db: Session, engineer_email: str):
+    """Remove an engineer's reports from the rollups inside the caller's transaction, before their history is deleted."""
+    table = models.ReportRollupDaily.__table__
+    # The engineer's own rows are exactly what was added to "*", including for history that predates rollups.
+    own_rows = db.execute(
+        table.select().where(table.c.engineer_email == engineer_email)
+    ).mappings().all()
+    for row in own_rows:
+        db.execute(
+            table.update()
+            .where(table.c.day == row["day"], table.c.engineer_email == ALL_ENGINEERS, table.c.risk_level == row["risk_level"])
+            .values(
+                report_count=table.c.report_count - row["report_count"],
+                latency_ms_total=table.c.latency_ms_total - row["latency_ms_total"],
+                latency_samples=table.c.latency_samples - row["latency_samples"],
+            )
+        )
+    db.execute(table.delete().where(table.c.engineer_email == engineer_email))
+    db.execute(table.delete().where(table.c.engineer_email == ALL_ENGINEERS, table.c.report_count <= 0))
+
+def rebuild_rollups(db: Session, since: date) -> int:
+    """Recompute rollups for every day from `since` from the history table. Reflects current rows only."""
+    grouped = _history_groups(db, models.History.timestamp >= datetime.combine(since, datetime.min.time()))
+
+    totals = {}
+    rows = []
+    for row_day, email, risk_level, count, latency_total, latency_samples in grouped:
+        rows.append((row_day, email, risk_level, count, latency_total, latency_samples))
+        total = totals.setdefault((row_day, risk_level), [0, 0, 0])
+        total[0] += count
+        total[1] += latency_total
+        total[2] += latency_samples
+    rows.extend((d, ALL_ENGINEERS, r, *values) for (d, r), values in totals.items())
+
+    db.query(models.ReportRollupDaily).filter(models.ReportRollupDaily.day >= since).delete(synchronize_session=False)
+    db.bulk_insert_mappings(models.ReportRollupDaily, [
+        {
+            "day": row_day,
+            "engineer_email": email,
+            "risk_level": risk_level,
+            "report_count": count,
+            "latency_ms_total": int(latency_total),
+            "latency_samples": latency_samples,
+        }
+        for row_day, email, risk_level, count, latency_total, latency_samples in rows
+    ])
+    db.commit()
+    return len(rows)
+
+def compact_recent():
+    """Periodic compactor for ROLLUP_MODE=compactor: rebuild the last ROLLUP_COMPACT_DAYS days."""
+    from app.database import SessionLocal
+
+    # Every worker schedules this; the lock (expiring just before the next tick) lets one of them run it per interval.
+    if resources.redis_client is None:
+        return
+    try:
+        acquired = resources.redis_client.set(COMPACTOR_LOCK_KEY, os.getpid(), nx=True, ex=max(1, int(ROLLUP_COMPACT_INTERVAL) - 1))
+    except ConnectionError as e:
+        logging.warning(f"Rollup compaction skipped, lock unavailable: {e}")
+        return
+    if not acquired:
+        return
+
+    since = datetime.now(timezone.utc).date() - timedelta(days=ROLLUP_COMPACT_DAYS - 1)
+    db = SessionLocal()
+    try:
+        rows = rebuild_rollups(db, since)
+    finally:
+        db.close()
+    logging.info(f"Rebuilt {rows} rollup rows since {since}.")
+
+def _summarize(rows):
+    """rows: (key, risk_level, report_count, latency_ms_total, latency_samples) already summed in SQL."""
+    summary = {}
+    for key, risk_level, report_count, latency_total, latency_samples in rows:
+        entry = summary.setdefault(key, {
+            "reports": 0,
+            "risk_levels": {level: 0 for level in RISK_LEVELS + (UNKNOWN_RISK,)},
+            "latency_ms_total": 0,
+            "latency_samples": 0,
+        })
+        entry["reports"] += report_count
+        entry["risk_levels"][risk_level] = entry["risk_levels"].get(risk_level, 0) + report_count
+        entry["latency_ms_total"] += latency_total or 0
+        entry["latency_samples"] += latency_samples or 0
+
+    for entry in summary.values():
+        samples = entry.pop("latency_samples")
+        total = entry.pop("latency_ms_total")
+        entry["avg_latency_ms"] = round(total / samples, 1) if samples else None
+    return summary
+
+def _grouped_rollups(db: Session, key_column, since: date, *filters):
+    rollup = models.ReportRollupDaily
+    return (
+        db.query(
+            key_column,
+            rollup.risk_level,
+            func.sum(rollup.report_count),
+            func.sum(rollup.latency_ms_total),
+            func.sum(rollup.latency_samples),
+        )
+        .filter(rollup.day >= since, *filters)
+        .group_by(key_column, rollup.risk_level)
+        .all()
+    )
+
+def get_daily_analytics(db: Session, since: date):
+    rollup = models.ReportRollupDaily
+    summary = _summarize(_grouped_rollups(db, rollup.day, since, rollup.engineer_email == ALL_ENGINEERS))
+    return [{"day": day, **summary[day]} for day in sorted(summary, reverse=True)]
+
+def get_engineer_analytics(db: Session, since: date):
+    rollup = models.ReportRollupDaily
+    summary = _summarize(_grouped_rollups(db, rollup.engineer_email, since, rollup.engineer_email != ALL_ENGINEERS))
+    return sorted(
+        ({"engineer_email": email, **entry} for email, entry in summary.items()),
+        key=lambda entry: entry["reports"],
+        reverse=True,
+    )
+
+# Run the script
+if __name__ == "__main__":
+    from app.database import SessionLocal
+
+    since = date.fromisoformat(sys.argv[1]) if len(sys.argv) > 1 else date(1970, 1, 1)
+    db = SessionLocal()
+    try:
+        print(f"Rebuilt {rebuild_rollups(db, since)} rollup rows since {since}.")
+    finally:
+        db.close()
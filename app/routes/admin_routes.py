@@ -1,12 +1,18 @@
 # Scanno_auth/app/routes/admin_routes.py
-from fastapi import APIRouter, Depends, HTTPException, Body
+import logging
+from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, Depends, HTTPException, Body, Query
 from sqlalchemy.orm import Session
+from typing import List, Optional
 
 from app import crud, utils
 from app.database import get_db
 from app.auth import get_current_admin, create_access_token, create_refresh_token
-from app.schemas import APIKeyCreate, UserLogin, Token
+from app.schemas import APIKeyCreate, UserLogin, Token, UsageResponse, RouteUsageResponse, DailyAnalytics, EngineerAnalytics
 from app.config import ADMIN_PASSWORD, ROLE_ADMIN
+from app.usage import flush_usage, get_route_metrics
+from app.resources import resources
+from app.rollups import get_daily_analytics, get_engineer_analytics
 
 router = APIRouter()
 
@@ -44,4 +50,51 @@ def delete_api_key(db: Session = Depends(get_db), current_admin: dict = Depends(
     if not crud.delete_api_key(db): 
         raise HTTPException(status_code=404, detail="API Key not found or already deleted")
     
-    return {"message": "API Key deleted successfully"}
\ No newline at end of file
+    return {"message": "API Key deleted successfully"}
+
+@router.get("/usage", response_model=List[UsageResponse])
+def get_usage_report(
+    days: int = Query(7, ge=1, le=366),
+    engineer_email: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_admin: dict = Depends(get_current_admin),
+):
+    try:
+        flush_usage()
+    except Exception as e:
+        logging.warning(f"Usage flush before report failed, serving last flushed values: {e}")
+    
+    since = datetime.now(timezone.utc).date() - timedelta(days=days - 1)
+    rows = crud.get_usage_since(db, since, engineer_email)
+    
+    return [
+        {
+            "day": row.day,
+            "engineer_email": row.engineer_email,
+            "requests": row.requests,
+            "prompt_tokens": row.prompt_tokens,
+            "completion_tokens": row.completion_tokens,
+            "total_tokens": row.prompt_tokens + row.completion_tokens,
+            "avg_latency_ms": round(row.latency_ms / row.requests, 1) if row.requests else 0.0,
+        }
+        for row in rows
+    ]
+
+@router.get("/usage/routes", response_model=List[RouteUsageResponse])
+def get_chat_route_usage(days: int = Query(7, ge=1, le=31), current_admin: dict = Depends(get_current_admin)):
+    if resources.redis_client is None:
+        raise HTTPException(status_code=503, detail="Route metrics unavailable: Redis is not connected.")
+    try:
+        return get_route_metrics(days)
+    except ConnectionError as e:
+        raise HTTPException(status_code=503, detail=f"Route metrics unavailable: {e}")
+
+@router.get("/analytics/daily", response_model=List[DailyAnalytics])
+def get_daily_report_analytics(days: int = Query(30, ge=1, le=366), db: Session = Depends(get_db), current_admin: dict = Depends(get_current_admin)):
+    since = datetime.now(timezone.utc).date() - timedelta(days=days - 1)
+    return get_daily_analytics(db, since)
+
+@router.get("/analytics/engineers", response_model=List[EngineerAnalytics])
+def get_engineer_report_analytics(days: int = Query(30, ge=1, le=366), db: Session = Depends(get_db), current_admin: dict = Depends(get_current_admin)):
+    since = datetime.now(timezone.utc).date() - timedelta(days=days - 1)
+    return get_engineer_analytics(db, since)
\ No newline at end of file
@@ -1,37 +1,38 @@
 # Scanno_auth/app/routes/chat_core.py
-import os, io, json, time, logging, base64, uuid
-import pdfplumber
-import redis 
-from typing import Optional, List 
+import os, io, json, time, logging, base64, uuid, functools, asyncio
+from typing import TYPE_CHECKING, Optional, List 
 from fastapi import APIRouter, File, UploadFile, HTTPException, Depends
 from sqlalchemy.orm import Session
-from openai import OpenAI
-from tenacity import retry, stop_after_attempt, wait_exponential
 
 from app.schemas import ChatMessage, ChatRequest, AnalysisResponse, HistoryCreate
-from app.config import REDIS_HOST, REDIS_PORT, REDIS_DB, SESSION_TTL
+from app.config import REDIS_HOST, REDIS_PORT, REDIS_DB, SESSION_TTL, DUPLICATE_DETECTION, MAX_REPORT_IMAGES, VISION_MAX_SIDE, FLAGSHIP_MODEL
 from app.auth import get_current_engineer
 from app.database import get_db
+from app.resources import resources
+from app.usage import record_usage, record_route_metrics, enforce_usage_quota
+from app.near_duplicates import compute_hashes, content_digest, find_duplicate, index_analysis
+from app.etags import session_key, session_version_key, queue_version_bump
+from app.backends import AnalysisBackend, BackendUnavailable, build_backend_chain, run_backends
+from app.model_router import ROUTE_MODELS, route_chat_turn
 from app import crud 
 
-router = APIRouter(tags=["Chat Core"])
-
-redis_client: redis.Redis = None
+if TYPE_CHECKING:
+    from openai import OpenAI
 
-def set_redis_client(client: redis.Redis):
-    global redis_client
-    redis_client = client
+router = APIRouter(tags=["Chat Core"])
 
 
-def get_openai_client(db: Session = Depends(get_db)) -> OpenAI:
+def get_openai_client(db: Session = Depends(get_db)) -> "OpenAI":
     api_key_record = crud.get_api_key(db)
     
     if not api_key_record or not api_key_record.key_value:
         raise HTTPException(status_code=503, detail="OpenAI service unavailable. API key not configured by admin.")
         
-    return OpenAI(api_key=api_key_record.key_value)
+    return resources.get_openai_client(api_key_record.key_value)
 
 def extract_text_from_pdf(pdf_bytes: bytes) -> Optional[str]:
+    import pdfplumber # pdfminer and Pillow are only loaded once a PDF is uploaded
+    
     try:
         with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
             text = "\n".join(page.extract_text() or "" for page in pdf.pages)
@@ -40,51 +41,113 @@ def extract_text_from_pdf(pdf_bytes: bytes) -> Optional[str]:
         logging.error(f"PDF reading failed: {e}")
         return None
 
+def prepare_image_for_vision(image_bytes: bytes) -> bytes:
+    """Upright, downscale and re-encode as JPEG; the model gains nothing from larger pages."""
+    from PIL import Image, ImageOps
+    
+    try:
+        image = ImageOps.exif_transpose(Image.open(io.BytesIO(image_bytes))).convert("RGB")
+        image.thumbnail((VISION_MAX_SIDE, VISION_MAX_SIDE))
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=85)
+        return buffer.getvalue()
+    except Exception as e:
+        logging.warning(f"Image preprocessing failed, sending original: {e}")
+        return image_bytes
+
+def retry_with_backoff(func):
+    """tenacity's retry policy, with tenacity itself imported on the first call rather than at startup."""
+    retrying = None
+    
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        nonlocal retrying
+        if retrying is None:
+            from tenacity import retry, stop_after_attempt, wait_exponential
+            retrying = retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))(func)
+        return retrying(*args, **kwargs)
+    
+    return wrapper
+
 def save_chat_history(session_id: str, history: List[ChatMessage]):
-    if not redis_client:
+    if not resources.redis_client:
         raise ConnectionError("Redis client is not initialized.")
         
-    key = f"chat:session:{session_id}"
-    redis_client.delete(key) 
-    
+    key = session_key(session_id)
     messages_json = [msg.model_dump_json() for msg in history]
-    if messages_json:
-        redis_client.lpush(key, *messages_json) 
     
-    redis_client.expire(key, SESSION_TTL)
+    def build(pipe):
+        pipe.delete(key) 
+        if messages_json:
+            pipe.lpush(key, *messages_json) 
+        pipe.expire(key, SESSION_TTL)
+        queue_version_bump(pipe, session_version_key(session_id), SESSION_TTL)
+    
+    resources.redis_client.execute_pipeline(build)
     logging.info(f"Session {session_id} saved with TTL set to {SESSION_TTL}s.")
 
 
 def load_chat_history(session_id: str) -> Optional[List[dict]]:
-    if not redis_client:
+    if not resources.redis_client:
         raise ConnectionError("Redis client is not initialized.")
         
-    key = f"chat:session:{session_id}"
+    key = session_key(session_id)
     
-    messages_json = redis_client.lrange(key, 0, -1)
+    messages_json, _ = resources.redis_client.execute_pipeline(
+        lambda pipe: pipe.lrange(key, 0, -1).expire(key, SESSION_TTL),
+        transaction=False,
+    )
     if not messages_json:
         return None
     
-    redis_client.expire(key, SESSION_TTL)
-    
     history = [json.loads(msg) for msg in messages_json]
     
     return history[::-1] 
 
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-def analyze_with_gpt_vision(image_bytes: bytes, client: OpenAI) -> str:
-    logging.info("Sending image to GPT-4o Vision...")
-    start = time.time()
-    base64_image = base64.b64encode(image_bytes).decode("utf-8")
+def poll_session_version(session_id: str) -> Optional[int]:
+    """One round trip: read the session's version and keep it alive, as a full load would."""
+    if not resources.redis_client:
+        raise ConnectionError("Redis client is not initialized.")
+    
+    version_key = session_version_key(session_id)
+    version, _, _ = resources.redis_client.execute_pipeline(
+        lambda pipe: pipe.get(version_key)
+            .expire(session_key(session_id), SESSION_TTL)
+            .expire(version_key, SESSION_TTL),
+        transaction=False,
+    )
+    return int(version) if version is not None else None
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {
-                    "role": "system",
-                    "content": """
+
+def load_session_snapshot(session_id: str, since: int = 0) -> Optional[tuple]:
+    """
+    Return (messages since index `since` as raw JSON strings in chronological order,
+    total message count, version) or None if the session does not exist.
+    """
+    if not resources.redis_client:
+        raise ConnectionError("Redis client is not initialized.")
+    
+    key = session_key(session_id)
+    version_key = session_version_key(session_id)
+    
+    # The list is stored newest-first, so chronological index N is list index len-1-N.
+    # MULTI (both keys share the session's hash slot) so the messages and version come from the
+    # same snapshot: a save landing in between would tag old messages with the new ETag.
+    messages_json, total, version, _, _ = resources.redis_client.execute_pipeline(
+        lambda pipe: pipe.lrange(key, 0, -(since + 1))
+            .llen(key)
+            .get(version_key)
+            .expire(key, SESSION_TTL)
+            .expire(version_key, SESSION_TTL),
+    )
+    if not total:
+        return None
+    
+    return messages_json[::-1], total, int(version) if version is not None else None
+
+
+VISION_SYSTEM_PROMPT = """
 You are Scanno — the official smart car inspection expert in Qatar.
 You analyze vehicle inspection reports in English or Arabic.
 
@@ -102,21 +165,42 @@ Guidelines:
   "recommendation": "final advice"
 }
 """
-                },
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": "Analyze this car inspection report image and respond in JSON only."},
-                        {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
-                    ]
-                }
+
+def analyze_with_gpt_vision(image_bytes: bytes, client: "OpenAI", engineer_email: str = None) -> str:
+    return analyze_with_gpt_vision_pages([image_bytes], client, engineer_email)
+
+
+@retry_with_backoff
+def analyze_with_gpt_vision_pages(images: List[bytes], client: "OpenAI", engineer_email: str = None) -> str:
+    logging.info(f"Sending {len(images)} image(s) to {FLAGSHIP_MODEL} vision...")
+    start = time.time()
+    
+    if len(images) == 1:
+        instruction = "Analyze this car inspection report image and respond in JSON only."
+    else:
+        instruction = (
+            f"These {len(images)} images are pages of the same car inspection report. "
+            "Analyze them together and respond with one consolidated JSON report only."
+        )
+    content = [{"type": "text", "text": instruction}]
+    for image_bytes in images:
+        base64_image = base64.b64encode(image_bytes).decode("utf-8")
+        content.append({"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}})
+
+    try:
+        response = client.chat.completions.create(
+            model=FLAGSHIP_MODEL,
+            messages=[
+                {"role": "system", "content": VISION_SYSTEM_PROMPT},
+                {"role": "user", "content": content}
             ],
             max_tokens=800,
             temperature=0.2
         )
 
         elapsed = time.time() - start
-        logging.info(f"GPT-4o Vision responded in {elapsed:.2f}s")
+        logging.info(f"{FLAGSHIP_MODEL} vision responded in {elapsed:.2f}s")
+        record_usage(engineer_email, response, elapsed)
         return response.choices[0].message.content.strip()
 
     except Exception as e:
@@ -124,12 +208,13 @@ Guidelines:
         raise HTTPException(status_code=500, detail=f"Vision analysis failed: {str(e)}")
 
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-def analyze_with_gpt_text(text: str, client: OpenAI) -> str:
-    logging.info("Analyzing text-based report with GPT-4o...")
+@retry_with_backoff
+def analyze_with_gpt_text(text: str, client: "OpenAI", engineer_email: str = None) -> str:
+    logging.info(f"Analyzing text-based report with {FLAGSHIP_MODEL}...")
+    start = time.time()
     try:
         response = client.chat.completions.create(
-            model="gpt-4o",
+            model=FLAGSHIP_MODEL,
             messages=[
                 {
                     "role": "system",
@@ -143,6 +228,7 @@ def analyze_with_gpt_text(text: str, client: OpenAI) -> str:
             response_format={"type": "json_object"},
             temperature=0.2
         )
+        record_usage(engineer_email, response, time.time() - start)
         return response.choices[0].message.content.strip()
     
     except Exception as e:
@@ -150,74 +236,191 @@ def analyze_with_gpt_text(text: str, client: OpenAI) -> str:
         raise HTTPException(status_code=500, detail=f"Text analysis failed: {str(e)}")
 
 
-@router.post("/analyze-report", response_model=AnalysisResponse)
+def chat_with_gpt(messages: List[dict], client: "OpenAI", engineer_email: str = None) -> str:
+    route = route_chat_turn(messages)
+    model = ROUTE_MODELS[route]
+    start = time.time()
+    response = client.chat.completions.create(
+        model=model,
+        messages=messages,
+        temperature=0.7, 
+        max_tokens=500 
+    )
+    elapsed = time.time() - start
+    logging.info(f"Chat turn routed to {route} ({model}), responded in {elapsed:.2f}s")
+    record_usage(engineer_email, response, elapsed)
+    record_route_metrics(route, model, response, elapsed)
+    return response.choices[0].message.content
+
+
+class OpenAIBackend(AnalysisBackend):
+    name = "openai"
+
+    def __init__(self, db: Session):
+        self.db = db
+        self._client = None
+
+    @property
+    def client(self) -> "OpenAI":
+        if self._client is None:
+            try:
+                self._client = get_openai_client(db=self.db)
+            except HTTPException as e:
+                raise BackendUnavailable(e.detail)
+        return self._client
+
+    def analyze_text(self, text: str, engineer_email: str = None) -> str:
+        return analyze_with_gpt_text(text, self.client, engineer_email)
+
+    def analyze_image(self, image_bytes: bytes, engineer_email: str = None) -> str:
+        return analyze_with_gpt_vision(image_bytes, self.client, engineer_email)
+
+    def analyze_images(self, images: List[bytes], engineer_email: str = None) -> str:
+        return analyze_with_gpt_vision_pages(images, self.client, engineer_email)
+
+    def chat(self, messages: List[dict], engineer_email: str = None) -> str:
+        return chat_with_gpt(messages, self.client, engineer_email)
+
+
+def get_analysis_backends(db: Session) -> List[AnalysisBackend]:
+    return build_backend_chain(OpenAIBackend(db))
+
+def timed_analysis(backends: List[AnalysisBackend], method: str, payload, engineer_email: str) -> tuple:
+    """Run an analysis and return (raw_response, latency in ms) for the report rollups."""
+    start = time.time()
+    raw_response = run_backends(backends, method, payload, engineer_email)
+    return raw_response, int((time.time() - start) * 1000)
+
+
+def complete_analysis(db: Session, engineer_email: str, filename: str, raw_response: str, system_content: str,
+                      model_latency_ms: int = None, image_fingerprint: tuple = None) -> dict:
+    """Parse the model's report, open the chat session and log history. Shared by the analyze endpoints."""
+    start = raw_response.find("{")
+    end = raw_response.rfind("}") + 1
+    json_str = raw_response[start:end]
+
+    if not json_str:
+        logging.error(f"AI response did not contain a valid JSON block: {raw_response[:100]}...")
+        raise HTTPException(status_code=500, detail="Analysis failed: AI response was malformed and contained no JSON data.")
+
+    report_json = json.loads(json_str)
+    if image_fingerprint:
+        index_analysis(*image_fingerprint, engineer_email, json_str)
+    bot_initial_message = json.dumps(report_json, indent=2)
+
+    session_id = str(uuid.uuid4())
+
+    initial_history = [
+        ChatMessage(role="system", content=system_content),
+        ChatMessage(role="assistant", content=bot_initial_message)
+    ]
+
+    save_chat_history(session_id, initial_history)
+
+    summary_text = report_json.get('summary', 'Summary not available in AI report.')
+
+    history_log = HistoryCreate(
+        chat_data=json.dumps({
+            "file": filename, 
+            "report_summary": summary_text 
+        })
+    )
+    crud.create_history_entry(
+        db, history_log, engineer_email,
+        risk_level=report_json.get('risk_level'),
+        latency_ms=model_latency_ms
+    )
+
+    return {
+        "session_id": session_id,
+        "file": filename, 
+        "report": report_json
+    }
+
+
+@router.post("/analyze-report", response_model=AnalysisResponse, dependencies=[Depends(enforce_usage_quota)])
 async def analyze_report(file: UploadFile = File(...), db: Session = Depends(get_db), current_engineer: dict = Depends(get_current_engineer)):
-    global redis_client 
-    
-    if redis_client is None:
+    if resources.redis_client is None or not resources.redis_client.available:
         raise HTTPException(status_code=503, detail="AI Chat service unavailable: Redis connection failed.")
 
     try:
-        client = get_openai_client(db=db)
+        backends = get_analysis_backends(db)
         
         filename = file.filename.lower()
         file_bytes = await file.read()
         text = None
+        image_fingerprint = None
+        model_latency_ms = None
         
         if filename.endswith(".pdf"):
             text = extract_text_from_pdf(file_bytes)
             if text:
-                raw_response = analyze_with_gpt_text(text, client)
+                raw_response, model_latency_ms = timed_analysis(backends, "analyze_text", text, current_engineer['email'])
                 system_content = f"You are Scanno — the smart car inspection expert in Qatar. The user has provided the following inspection report text: {text}"
             else:
-                raw_response = analyze_with_gpt_vision(file_bytes, client)
+                raw_response, model_latency_ms = timed_analysis(backends, "analyze_image", file_bytes, current_engineer['email'])
                 system_content = "You are Scanno — the smart car inspection expert in Qatar. The user has uploaded an image/scanned PDF of a car inspection report."
                 
         elif filename.endswith((".jpg", ".jpeg", ".png")):
-            raw_response = analyze_with_gpt_vision(file_bytes, client)
+            raw_response = None
+            if DUPLICATE_DETECTION:
+                image_fingerprint = (content_digest(file_bytes), compute_hashes(file_bytes))
+                raw_response = find_duplicate(*image_fingerprint, current_engineer['email'])
+            if raw_response is None:
+                raw_response, model_latency_ms = timed_analysis(backends, "analyze_image", file_bytes, current_engineer['email'])
             system_content = "You are Scanno — the smart car inspection expert in Qatar. The user has uploaded an image of a car inspection report."
             
         else:
             raise HTTPException(status_code=400, detail="Unsupported file type.")
         
-        start = raw_response.find("{")
-        end = raw_response.rfind("}") + 1
-        json_str = raw_response[start:end]
-        
-        if not json_str:
-            logging.error(f"AI response did not contain a valid JSON block: {raw_response[:100]}...")
-            raise HTTPException(status_code=500, detail="Analysis failed: AI response was malformed and contained no JSON data.")
-        
-        report_json = json.loads(json_str)
-        bot_initial_message = json.dumps(report_json, indent=2)
-        
-        session_id = str(uuid.uuid4())
-        
-        initial_history = [
-            ChatMessage(role="system", content=system_content),
-            ChatMessage(role="assistant", content=bot_initial_message)
-        ]
+        return complete_analysis(
+            db, current_engineer['email'], filename, raw_response, system_content,
+            model_latency_ms=model_latency_ms, image_fingerprint=image_fingerprint
+        )
         
-        save_chat_history(session_id, initial_history)
+    except HTTPException:
+        raise
+    except ConnectionError:
+        raise HTTPException(status_code=503, detail="Redis connection failed. Chat state is unavailable.")
+    except json.JSONDecodeError as e:
+        logging.error(f"JSON Parsing failed after AI response: {e}")
+        raise HTTPException(status_code=500, detail="Analysis failed: AI returned unparseable structured data.")
+    except Exception as e:
+        logging.error(f"Critical Analysis failed for engineer {current_engineer.get('email', 'Unknown')}: {type(e).__name__} - {e}")
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {type(e).__name__} during processing.")
+
+@router.post("/analyze-report/multi", response_model=AnalysisResponse, dependencies=[Depends(enforce_usage_quota)])
+async def analyze_multi_image_report(files: List[UploadFile] = File(...), db: Session = Depends(get_db), current_engineer: dict = Depends(get_current_engineer)):
+    if resources.redis_client is None or not resources.redis_client.available:
+        raise HTTPException(status_code=503, detail="AI Chat service unavailable: Redis connection failed.")
+    
+    if len(files) > MAX_REPORT_IMAGES:
+        raise HTTPException(status_code=400, detail=f"Too many images. Upload at most {MAX_REPORT_IMAGES} pages per report.")
+    
+    filenames = [file.filename.lower() for file in files]
+    if not all(name.endswith((".jpg", ".jpeg", ".png")) for name in filenames):
+        raise HTTPException(status_code=400, detail="Unsupported file type. Only .jpg, .jpeg and .png pages are accepted.")
+
+    try:
+        backends = get_analysis_backends(db)
         
-        summary_text = report_json.get('summary', 'Summary not available in AI report.')
+        raw_images = await asyncio.gather(*(file.read() for file in files))
+        images = await asyncio.gather(*(asyncio.to_thread(prepare_image_for_vision, image) for image in raw_images))
         
-        history_log = HistoryCreate(
-            chat_data=json.dumps({
-                "file": filename, 
-                "report_summary": summary_text 
-            })
+        raw_response, model_latency_ms = await asyncio.to_thread(
+            timed_analysis, backends, "analyze_images", list(images), current_engineer['email']
         )
-        crud.create_history_entry(db, history_log, current_engineer['email'])
+        system_content = f"You are Scanno — the smart car inspection expert in Qatar. The user has uploaded {len(images)} images (pages) of one car inspection report."
         
-        return {
-            "session_id": session_id,
-            "file": filename, 
-            "report": report_json
-        }
+        return complete_analysis(
+            db, current_engineer['email'], ", ".join(filenames), raw_response, system_content,
+            model_latency_ms=model_latency_ms
+        )
         
     except HTTPException:
         raise
+    except ConnectionError:
+        raise HTTPException(status_code=503, detail="Redis connection failed. Chat state is unavailable.")
     except json.JSONDecodeError as e:
         logging.error(f"JSON Parsing failed after AI response: {e}")
         raise HTTPException(status_code=500, detail="Analysis failed: AI returned unparseable structured data.")
@@ -225,7 +428,7 @@ async def analyze_report(file: UploadFile = File(...), db: Session = Depends(get
         logging.error(f"Critical Analysis failed for engineer {current_engineer.get('email', 'Unknown')}: {type(e).__name__} - {e}")
         raise HTTPException(status_code=500, detail=f"Analysis failed: {type(e).__name__} during processing.")
 
-@router.post("/chat")
+@router.post("/chat", dependencies=[Depends(enforce_usage_quota)])
 async def chat_with_report(chat_data: ChatRequest, db: Session = Depends(get_db), current_engineer: dict = Depends(get_current_engineer)):
     session_id = chat_data.session_id
     user_message = chat_data.message
@@ -243,16 +446,9 @@ async def chat_with_report(chat_data: ChatRequest, db: Session = Depends(get_db)
     
     openai_messages = history
     
-    logging.info(f"Session {session_id}: Sending {len(openai_messages)} messages to GPT-4o...")
+    logging.info(f"Session {session_id}: Sending {len(openai_messages)} messages to the chat backends...")
     try:
-        client = get_openai_client(db=db)
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=openai_messages,
-            temperature=0.7, 
-            max_tokens=500 
-        )
-        bot_response_content = response.choices[0].message.content
+        bot_response_content = run_backends(get_analysis_backends(db), "chat", openai_messages, current_engineer['email'])
         
     except HTTPException:
         raise 
@@ -264,6 +460,9 @@ async def chat_with_report(chat_data: ChatRequest, db: Session = Depends(get_db)
     history.append(bot_chat_message.model_dump())
     
     history_to_save = [ChatMessage(**msg) for msg in history]
-    save_chat_history(session_id, history_to_save)
+    try:
+        save_chat_history(session_id, history_to_save)
+    except ConnectionError:
+        raise HTTPException(status_code=503, detail="Redis connection failed. Chat state is unavailable.")
     
     return {"session_id": session_id, "response": bot_response_content}
\ No newline at end of file
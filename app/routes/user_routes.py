@@ -1,14 +1,22 @@
 # Scanno_auth/app/routes/user_routes.py
-from fastapi import APIRouter, HTTPException, Depends, Body
+import json
+from fastapi import APIRouter, HTTPException, Depends, Body, Query, Request, Response
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from typing import List 
 
 from app import crud, models, utils
 from app.database import get_db
 from app.auth import create_access_token, create_refresh_token, get_current_engineer
-from app.schemas import UserCreate, UserLogin, Token, HistoryCreate, HistoryResponse, FullSessionHistory, ChatMessage, PasswordChange
+from app.schemas import UserCreate, UserLogin, Token, HistoryCreate, HistoryResponse, FullSessionHistory, PasswordChange
 from app.config import ROLE_ENGINEER
-from app.routes.chat_core import load_chat_history
+from app.routes.chat_core import poll_session_version, load_session_snapshot
+from app.etags import current_version, history_version_key, make_etag, etag_matches
+
+CACHE_HEADERS = {"Cache-Control": "private, no-cache"}
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, **CACHE_HEADERS})
 
 router = APIRouter()
 
@@ -76,13 +84,27 @@ def change_password(passwords: PasswordChange, current_engineer: dict = Depends(
     return {"message": "Password updated successfully."}
 
 @router.get("/history", response_model=List[HistoryResponse])
-def get_chat_history(current_engineer: dict = Depends(get_current_engineer), db: Session = Depends(get_db)):
+def get_chat_history(request: Request, current_engineer: dict = Depends(get_current_engineer), db: Session = Depends(get_db)):
+    # Reading the version before the query means a concurrent write causes an extra refetch, never a stale 304.
+    version = current_version(history_version_key(current_engineer['email']))
+    etag = make_etag(version) if version is not None else None
+    
+    if etag and etag_matches(request, etag):
+        return not_modified(etag)
+    
     history = crud.get_history_by_engineer_email(db, current_engineer['email'])
     
-    if not history:
-        return [] 
-        
-    return history
+    content = [
+        {
+            "id": row.id,
+            "engineer_email": row.engineer_email,
+            "chat_data": row.chat_data,
+            "timestamp": row.timestamp.isoformat(),
+        }
+        for row in history
+    ]
+    headers = {"ETag": etag, **CACHE_HEADERS} if etag else None
+    return JSONResponse(content=content, headers=headers)
 
 @router.delete("/history")
 def delete_chat_history(current_engineer: dict = Depends(get_current_engineer), db: Session = Depends(get_db)):
@@ -94,16 +116,31 @@ def delete_chat_history(current_engineer: dict = Depends(get_current_engineer),
     return {"message": f"Successfully deleted {deleted_count} history entries."}
 
 @router.get("/session/{session_id}", response_model=FullSessionHistory)
-def get_session_history(session_id: str, current_engineer: dict = Depends(get_current_engineer)):
+def get_session_history(
+    session_id: str,
+    request: Request,
+    since: int = Query(0, ge=0, description="Only return messages from this index on."),
+    current_engineer: dict = Depends(get_current_engineer),
+):
     try:
-        history = load_chat_history(session_id)
+        if request.headers.get("if-none-match"):
+            version = poll_session_version(session_id)
+            if version is not None and etag_matches(request, make_etag(version, f"since{since}")):
+                return not_modified(make_etag(version, f"since{since}"))
+        
+        snapshot = load_session_snapshot(session_id, since)
     except ConnectionError:
         raise HTTPException(status_code=503, detail="Redis connection failed. Chat state is unavailable.")
     
-    if not history:
+    if not snapshot:
         raise HTTPException(status_code=404, detail="Chat session expired or not found.")
     
-    return {
-        "session_id": session_id,
-        "messages": [ChatMessage(**msg) for msg in history]
-    }
\ No newline at end of file
+    messages_json, total, version = snapshot
+    
+    # Messages were validated when saved, so the stored JSON is passed through as-is.
+    body = (
+        f'{{"session_id": {json.dumps(session_id)}, "since": {since}, '
+        f'"total_messages": {total}, "messages": [{",".join(messages_json)}]}}'
+    )
+    headers = {"ETag": make_etag(version, f"since{since}"), **CACHE_HEADERS} if version is not None else None
+    return Response(content=body, media_type="application/json", headers=headers)
\ No newline at end of file
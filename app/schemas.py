@@ -1,7 +1,7 @@
 # Scanno_auth/app/schemas.py
 from pydantic import BaseModel, EmailStr
-from typing import List
-from datetime import datetime
+from typing import Dict, List, Optional
+from datetime import datetime, date
 
 class APIKeyCreate(BaseModel):
     api_key: str
@@ -50,4 +50,37 @@ class AnalysisResponse(BaseModel):
 
 class FullSessionHistory(BaseModel):
     session_id: str
-    messages: List[ChatMessage]
\ No newline at end of file
+    since: int = 0
+    total_messages: int = 0
+    messages: List[ChatMessage]
+
+class UsageResponse(BaseModel):
+    day: date
+    engineer_email: str
+    requests: int
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+    avg_latency_ms: float
+
+class RouteUsageResponse(BaseModel):
+    day: date
+    route: str
+    model: str
+    requests: int
+    prompt_tokens: int
+    completion_tokens: int
+    avg_latency_ms: float
+    estimated_cost_usd: Optional[float] = None
+
+class DailyAnalytics(BaseModel):
+    day: date
+    reports: int
+    risk_levels: Dict[str, int]
+    avg_latency_ms: Optional[float] = None
+
+class EngineerAnalytics(BaseModel):
+    engineer_email: str
+    reports: int
+    risk_levels: Dict[str, int]
+    avg_latency_ms: Optional[float] = None
\ No newline at end of file
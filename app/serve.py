@@ -0,0 +1,21 @@
+# Scanno_auth/app/serve.py
+# Production entry point: python -m app.migrate && python -m app.serve
+import uvicorn
+
+from app.config import HOST, PORT, WEB_CONCURRENCY, GRACEFUL_TIMEOUT
+
+def main():
+    # Each worker is a separate process with its own lifespan-managed pools.
+    # On SIGTERM uvicorn stops accepting connections, waits up to GRACEFUL_TIMEOUT
+    # for open requests (in-flight analyses) and then runs the lifespan shutdown.
+    uvicorn.run(
+        "app.main:app",
+        host=HOST,
+        port=PORT,
+        workers=WEB_CONCURRENCY,
+        proxy_headers=True,
+        timeout_graceful_shutdown=GRACEFUL_TIMEOUT,
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+# Scanno_auth/app/usage.py
+import logging
+from datetime import datetime, date, timedelta, timezone
+from fastapi import Depends, HTTPException
+
+from app.config import DAILY_TOKEN_QUOTA, DAILY_REQUEST_QUOTA, MODEL_PRICES
+from app.auth import get_current_engineer
+from app.database import SessionLocal
+from app.resources import resources
+from app import crud
+
+USAGE_KEY_TTL = 8 * 24 * 3600 # Keep a week of counters in Redis in case flushes fall behind
+DIRTY_SET_KEY = "usage:dirty"
+COUNTER_FIELDS = ("requests", "prompt_tokens", "completion_tokens", "latency_ms")
+ROUTE_METRICS_TTL = 32 * 24 * 3600 # Per-route chat metrics are only kept in Redis, for a month
+
+def _today() -> str:
+    return datetime.now(timezone.utc).date().isoformat()
+
+def _usage_key(day: str, engineer_email: str) -> str:
+    return f"usage:{day}:{engineer_email}"
+
+def record_usage(engineer_email: str, response, elapsed: float):
+    """Add one model call to today's Redis counters. Accounting never fails the request."""
+    if not engineer_email or resources.redis_client is None:
+        return
+
+    usage = getattr(response, "usage", None)
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    key = _usage_key(_today(), engineer_email)
+
+    def build(pipe):
+        pipe.hincrby(key, "requests", 1)
+        pipe.hincrby(key, "prompt_tokens", prompt_tokens)
+        pipe.hincrby(key, "completion_tokens", completion_tokens)
+        pipe.hincrby(key, "latency_ms", int(elapsed * 1000))
+        pipe.expire(key, USAGE_KEY_TTL)
+        pipe.sadd(DIRTY_SET_KEY, key)
+
+    try:
+        resources.redis_client.execute_pipeline(build, transaction=False)
+    except ConnectionError as e:
+        logging.warning(f"Usage for {engineer_email} not recorded: {e}")
+
+def _route_metrics_key(day: str) -> str:
+    return f"usage:routes:{day}"
+
+def record_route_metrics(route: str, model: str, response, elapsed: float):
+    """Count one chat turn against today's per-route, per-model metrics used to tune the model router."""
+    if resources.redis_client is None:
+        return
+
+    usage = getattr(response, "usage", None)
+    values = {
+        "requests": 1,
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        "latency_ms": int(elapsed * 1000),
+    }
+    key = _route_metrics_key(_today())
+
+    def build(pipe):
+        for field, value in values.items():
+            pipe.hincrby(key, f"{route}|{model}|{field}", value)
+        pipe.expire(key, ROUTE_METRICS_TTL)
+
+    try:
+        resources.redis_client.execute_pipeline(build, transaction=False)
+    except ConnectionError as e:
+        logging.warning(f"Route metrics for {route} not recorded: {e}")
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int):
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        return None
+    return round((prompt_tokens * prices[0] + completion_tokens * prices[1]) / 1_000_000, 6)
+
+def get_route_metrics(days: int) -> list:
+    today = datetime.now(timezone.utc).date()
+    day_list = [(today - timedelta(days=offset)).isoformat() for offset in range(days)]
+    counters = resources.redis_client.execute_pipeline(
+        lambda pipe: [pipe.hgetall(_route_metrics_key(day)) for day in day_list],
+        transaction=False,
+    )
+
+    rows = []
+    for day, values in zip(day_list, counters):
+        grouped = {}
+        for field, value in (values or {}).items():
+            route, model, counter = field.rsplit("|", 2)
+            grouped.setdefault((route, model), {})[counter] = int(value)
+
+        for (route, model), totals in sorted(grouped.items()):
+            requests = totals.get("requests", 0)
+            prompt_tokens = totals.get("prompt_tokens", 0)
+            completion_tokens = totals.get("completion_tokens", 0)
+            rows.append({
+                "day": day,
+                "route": route,
+                "model": model,
+                "requests": requests,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "avg_latency_ms": round(totals.get("latency_ms", 0) / requests, 1) if requests else 0.0,
+                "estimated_cost_usd": estimate_cost(model, prompt_tokens, completion_tokens),
+            })
+    return rows
+
+def enforce_usage_quota(current_engineer: dict = Depends(get_current_engineer)):
+    if not (DAILY_TOKEN_QUOTA or DAILY_REQUEST_QUOTA) or resources.redis_client is None:
+        return
+
+    key = _usage_key(_today(), current_engineer['email'])
+    try:
+        requests, prompt_tokens, completion_tokens = resources.redis_client.hmget(
+            key, "requests", "prompt_tokens", "completion_tokens"
+        )
+    except ConnectionError as e:
+        # Quotas protect our rate limits; losing Redis should not also take the API down.
+        logging.warning(f"Quota check skipped for {current_engineer['email']}: {e}")
+        return
+
+    if DAILY_REQUEST_QUOTA and int(requests or 0) >= DAILY_REQUEST_QUOTA:
+        raise HTTPException(status_code=429, detail="Daily request quota exceeded. Try again tomorrow.")
+
+    if DAILY_TOKEN_QUOTA and int(prompt_tokens or 0) + int(completion_tokens or 0) >= DAILY_TOKEN_QUOTA:
+        raise HTTPException(status_code=429, detail="Daily token quota exceeded. Try again tomorrow.")
+
+def flush_usage() -> int:
+    """Copy every counter touched since the last flush into usage_daily in one transaction."""
+    if resources.redis_client is None:
+        return 0
+
+    keys = resources.redis_client.spop(DIRTY_SET_KEY, 1000)
+    if not keys:
+        return 0
+
+    counters = resources.redis_client.execute_pipeline(
+        lambda pipe: [pipe.hgetall(key) for key in keys],
+        transaction=False,
+    )
+
+    db = SessionLocal()
+    try:
+        for key, values in zip(keys, counters):
+            if not values:
+                continue
+            _, day, engineer_email = key.split(":", 2)
+            crud.upsert_usage_daily(
+                db,
+                date.fromisoformat(day),
+                engineer_email,
+                {field: int(values.get(field, 0)) for field in COUNTER_FIELDS},
+            )
+        db.commit()
+    except Exception:
+        db.rollback()
+        # Put the keys back so the next flush retries them.
+        resources.redis_client.sadd(DIRTY_SET_KEY, *keys)
+        raise
+    finally:
+        db.close()
+
+    logging.info(f"Flushed usage counters for {len(keys)} engineer-days.")
+    return len(keys)